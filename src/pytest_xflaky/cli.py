@@ -0,0 +1,183 @@
+import argparse
+import os
+import sys
+import time
+
+from .collector import TOKEN_ENV, make_server
+from .query import FAILED, FAILLINENO, FLAKY, NODEID, OK, OWNER, SORT_KEYS, QueryIndex
+
+
+def format_entry(entry):
+    label = " FLAKY" if entry[FLAKY] else ""
+    owner = f" @{entry[OWNER]}" if entry[OWNER] else ""
+    runs = entry[OK] + entry[FAILED]
+    return (
+        f"{entry[NODEID]}:{entry[FAILLINENO]} "
+        f"(failed: {entry[FAILED]}/{runs}){owner}{label}"
+    )
+
+
+def format_node(node):
+    name, tests, ok, failed, flaky = node
+    return (
+        f"{name} (tests: {tests}, runs: {ok + failed}, "
+        f"failures: {failed}, flaky: {flaky})"
+    )
+
+
+def cmd_query(args):
+    started = time.perf_counter()
+    try:
+        index = QueryIndex(args.index)
+    except (FileNotFoundError, ValueError) as e:
+        sys.stderr.write(f"{e}, run pytest --xflaky-report to build it\n")
+        return 1
+    loaded = time.perf_counter()
+
+    try:
+        if args.rollup:
+            lines = [
+                format_node(node)
+                for node in sorted(
+                    index.rollup(args.prefix),
+                    key=lambda node: (node[4], node[3]),
+                    reverse=True,
+                )
+            ]
+        else:
+            lines = [
+                format_entry(entry)
+                for entry in index.query(
+                    args.prefix,
+                    owner=args.owner,
+                    flaky_only=args.flaky_only,
+                    sort=args.sort,
+                    top=args.top,
+                )
+            ]
+    finally:
+        index.close()
+
+    finished = time.perf_counter()
+    sys.stdout.write("".join(f"{line}\n" for line in lines))
+    if args.timings:
+        sys.stderr.write(
+            f"load: {(loaded - started) * 1000:.1f}ms, "
+            f"query: {(finished - loaded) * 1000:.1f}ms\n"
+        )
+
+    return 0
+
+
+def cmd_collector(args):
+    token = os.environ.get(TOKEN_ENV)
+    server = make_server(args.host, args.port, args.reports_directory, token=token)
+    host, port = server.server_address[:2]
+    sys.stdout.write(
+        f"Collecting runs into {args.reports_directory}, "
+        f"use --xflaky-collector-url http://{host}:{port}\n"
+    )
+    if not token:
+        sys.stdout.write(
+            f"Accepting batches from anyone, set {TOKEN_ENV} to require it\n"
+        )
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="xflaky")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    query_parser = subparsers.add_parser(
+        "query",
+        help="Query the index built by pytest --xflaky-report",
+    )
+    query_parser.add_argument(
+        "prefix",
+        nargs="?",
+        default="",
+        help="Nodeid prefix to filter by, e.g. tests/billing/ or tests/a.py::Case",
+    )
+    query_parser.add_argument(
+        "--index",
+        default=".xflaky_query_index.db",
+        help="Query index file (see --xflaky-query-index-file)",
+    )
+    query_parser.add_argument(
+        "--top",
+        default=20,
+        type=int,
+        help="Number of tests to show, 0 to show all",
+    )
+    query_parser.add_argument(
+        "--sort",
+        default="failure-rate",
+        choices=sorted(SORT_KEYS),
+        help="Sort key for tests",
+    )
+    query_parser.add_argument(
+        "--owner",
+        default=None,
+        help="Only show tests owned by the given GitHub user",
+    )
+    query_parser.add_argument(
+        "--flaky-only",
+        default=False,
+        action="store_true",
+        help="Only show flaky tests",
+    )
+    query_parser.add_argument(
+        "--rollup",
+        default=False,
+        action="store_true",
+        help="Show counts rolled up per directory, module or class below prefix",
+    )
+    query_parser.add_argument(
+        "--timings",
+        default=False,
+        action="store_true",
+        help="Print load and query timings to stderr",
+    )
+    query_parser.set_defaults(func=cmd_query)
+
+    collector_parser = subparsers.add_parser(
+        "collector",
+        help="Receive runs sent with pytest --xflaky-collector-url",
+    )
+    collector_parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on",
+    )
+    collector_parser.add_argument(
+        "--port",
+        default=8765,
+        type=int,
+        help="Port to listen on",
+    )
+    collector_parser.add_argument(
+        "--reports-directory",
+        default=".reports",
+        help="Directory to store json reports (see --xflaky-reports-directory)",
+    )
+    collector_parser.set_defaults(func=cmd_collector)
+
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+import enum
+import gzip
+import hmac
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from .run_index import RunIndex
+
+BATCHES_PATH = "/batches"
+PARTS_DIRECTORY = ".parts"
+SPOOL_DIRECTORY = "spool"
+TOKEN_HEADER = "X-Xflaky-Token"
+TOKEN_ENV = "XFLAKY_COLLECTOR_TOKEN"
+
+# A batch of 500 test records is well under a MiB, even with long tracebacks
+MAX_BODY_SIZE = 16 * 1024 * 1024
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+# Runs missing batches are dropped when no batch arrived for that long, spooled
+# batches are usually sent again within a day
+INCOMPLETE_RUN_TIMEOUT = 7 * 24 * 3600
+EXPIRE_CHECK_INTERVAL = 60
+
+
+class PayloadTooLarge(ValueError):
+    pass
+
+
+def gunzip(data, max_size):
+    """Decompress gzip data, refusing to produce more than max_size bytes."""
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    try:
+        decompressed = decompressor.decompress(data, max_size + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip body: {e}") from e
+    if len(decompressed) > max_size or decompressor.unconsumed_tail:
+        raise PayloadTooLarge(f"Decompressed body is over {max_size} bytes")
+    return decompressed
+
+
+def make_batch(run_id, seq, tests, json_report=None):
+    """Return a batch of test records of a run.
+
+    The last batch is given the json report, and carries the rest of it (root,
+    xflaky data, ...) and the number of batches, so the collector knows when
+    the run is complete.
+    """
+    batch = {"run_id": run_id, "seq": seq, "tests": tests}
+    if json_report is not None:
+        batch["total"] = seq + 1
+        batch["report"] = {
+            key: value
+            for key, value in json_report.items()
+            if key in {"created", "duration", "exitcode", "root", "summary", "xflaky"}
+        }
+    return batch
+
+
+class PostResult(enum.Enum):
+    SENT = "sent"
+    # Kept in the spool and sent again later
+    UNDELIVERED = "undelivered"
+    REJECTED = "rejected"
+    TOO_LARGE = "too large"
+
+
+class CollectorStore:
+    """Assemble batches into json reports in a reports directory.
+
+    Batches are written to disk as they arrive, keyed by run id and sequence
+    number, so retried batches are idempotent and a restart loses nothing.
+    Runs that stay incomplete, e.g. because a batch was rejected, are dropped
+    once no batch arrived for ``incomplete_run_timeout`` seconds.
+    """
+
+    def __init__(self, directory, *, incomplete_run_timeout=INCOMPLETE_RUN_TIMEOUT):
+        self.directory = directory
+        self.parts_directory = os.path.join(directory, PARTS_DIRECTORY)
+        self.incomplete_run_timeout = incomplete_run_timeout
+        self.lock = threading.Lock()
+        self.expired_at = 0.0
+        os.makedirs(self.parts_directory, exist_ok=True)
+
+    def add(self, batch):
+        run_id = str(batch["run_id"])
+        if not run_id.replace("-", "").isalnum():
+            raise ValueError(f"Invalid run id: {run_id}")
+
+        with self.lock:
+            # A retry of a batch whose response was lost after the run was
+            # assembled, don't start collecting the run again
+            if os.path.exists(os.path.join(self.directory, f"{run_id}-report.json")):
+                return
+
+            run_directory = os.path.join(self.parts_directory, run_id)
+            os.makedirs(run_directory, exist_ok=True)
+            seq = int(batch["seq"])
+            with open(os.path.join(run_directory, f"{seq}.json"), "w") as fp:
+                json.dump(batch, fp)
+
+            if "total" in batch:
+                with open(os.path.join(run_directory, "total"), "w") as fp:
+                    fp.write(str(int(batch["total"])))
+
+            self.maybe_assemble(run_id, run_directory)
+            self.maybe_expire()
+
+    def maybe_expire(self):
+        now = time.time()
+        if now - self.expired_at < EXPIRE_CHECK_INTERVAL:
+            return
+        self.expired_at = now
+
+        for run_id in os.listdir(self.parts_directory):
+            run_directory = os.path.join(self.parts_directory, run_id)
+            if not os.path.isdir(run_directory):
+                continue
+            # Writing a batch updates the mtime of the run directory
+            if now - os.stat(run_directory).st_mtime > self.incomplete_run_timeout:
+                shutil.rmtree(run_directory, ignore_errors=True)
+
+    def maybe_assemble(self, run_id, run_directory):
+        filenames = os.listdir(run_directory)
+        if "total" not in filenames:
+            return
+
+        with open(os.path.join(run_directory, "total")) as fp:
+            total = int(fp.read())
+        if len(filenames) - 1 < total:
+            return
+
+        batches = []
+        for seq in range(total):
+            with open(os.path.join(run_directory, f"{seq}.json")) as fp:
+                batches.append(json.load(fp))
+
+        report = dict(batches[-1]["report"])
+        report["tests"] = [test for batch in batches for test in batch["tests"]]
+
+        filename = f"{run_id}-report.json"
+        tmp_path = os.path.join(self.parts_directory, f"{filename}.tmp")
+        with open(tmp_path, "w") as fp:
+            json.dump(report, fp)
+        os.replace(tmp_path, os.path.join(self.directory, filename))
+
+        run_index = RunIndex(self.directory)
+        run_index.fingerprint(filename, run_id=report.get("xflaky", {}).get("run_id"))
+        run_index.save()
+
+        for filename in os.listdir(run_directory):
+            os.remove(os.path.join(run_directory, filename))
+        os.rmdir(run_directory)
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    # Keep connections alive between batches
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"ok": True})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def reject(self, status, error):
+        # The body may not have been read, so the connection can't be reused
+        self.close_connection = True
+        self.send_json(status, {"error": error})
+
+    def do_POST(self):
+        if self.path != BATCHES_PATH:
+            self.reject(404, "not found")
+            return
+
+        token = self.server.token
+        if token and not hmac.compare_digest(
+            self.headers.get(TOKEN_HEADER, "").encode("utf-8"), token.encode("utf-8")
+        ):
+            self.reject(401, "invalid token")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            self.reject(400, "invalid Content-Length")
+            return
+        if length > self.server.max_body_size:
+            self.reject(413, f"Body is over {self.server.max_body_size} bytes")
+            return
+
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gunzip(body, self.server.max_decompressed_size)
+            self.server.store.add(json.loads(body))
+        except PayloadTooLarge as e:
+            self.send_json(413, {"error": str(e)})
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+        else:
+            self.send_json(200, {"ok": True})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(
+    host,
+    port,
+    directory,
+    *,
+    token=None,
+    max_body_size=MAX_BODY_SIZE,
+    max_decompressed_size=MAX_DECOMPRESSED_SIZE,
+    incomplete_run_timeout=INCOMPLETE_RUN_TIMEOUT,
+    verbose=False,
+):
+    """Return a collector server, only accepting batches with ``token`` if set."""
+    server = ThreadingHTTPServer((host, port), CollectorHandler)
+    server.store = CollectorStore(
+        directory, incomplete_run_timeout=incomplete_run_timeout
+    )
+    server.token = token
+    server.max_body_size = max_body_size
+    server.max_decompressed_size = max_decompressed_size
+    server.verbose = verbose
+    return server
+
+
+class CollectorClient:
+    """Send json reports to a collector, spooling batches it could not deliver.
+
+    Runs are sent once the session finished, and batches are spooled as soon
+    as the collector can't be connected to, so a collector that is down only
+    delays the end of the session by ``connect_timeout``. Spooled batches are
+    sent again the next time the client sends anything.
+    Batches too large for the collector are split in halves and sent again.
+    Batches it rejects are dropped, and their runs are recorded in
+    ``incomplete_runs`` since the collector will never assemble them.
+    """
+
+    def __init__(
+        self,
+        url,
+        spool_directory,
+        *,
+        token=None,
+        batch_size=500,
+        retries=3,
+        connect_timeout=2,
+        timeout=10,
+    ):
+        self.url = url.rstrip("/") + BATCHES_PATH
+        self.token = token
+        self.spool_directory = spool_directory
+        self.batch_size = batch_size
+        self.retries = retries
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.sent = 0
+        self.spooled = 0
+        self.rejected = 0
+        self.incomplete_runs = set()
+
+    def post(self, data):
+        """Post a gzip compressed batch, returning a `PostResult`."""
+        headers = {"Content-Encoding": "gzip", "Content-Type": "application/json"}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+
+        for attempt in range(self.retries):
+            try:
+                response = self.session.post(
+                    self.url,
+                    data=data,
+                    headers=headers,
+                    timeout=(self.connect_timeout, self.timeout),
+                )
+            except requests.ConnectionError:
+                # Collector down, spool right away instead of blocking the session
+                return PostResult.UNDELIVERED
+            except requests.RequestException:
+                pass
+            else:
+                if response.ok:
+                    return PostResult.SENT
+
+                # Keep the batch until the token is fixed
+                if response.status_code == 401:
+                    return PostResult.UNDELIVERED
+
+                if response.status_code == 413:
+                    return PostResult.TOO_LARGE
+
+                # Client errors won't get better by retrying
+                if response.status_code < 500:
+                    return PostResult.REJECTED
+
+            if attempt < self.retries - 1:
+                time.sleep(0.5 * 2**attempt)
+
+        return PostResult.UNDELIVERED
+
+    def reject(self, run_id):
+        self.rejected += 1
+        self.incomplete_runs.add(run_id)
+
+    def spool(self, run_id, seq, data):
+        os.makedirs(self.spool_directory, exist_ok=True)
+        path = os.path.join(self.spool_directory, f"{run_id}-{seq:06d}.json.gz")
+        with open(path, "wb") as fp:
+            fp.write(data)
+        self.spooled += 1
+
+    def flush_spool(self):
+        """Send spooled batches, returning False if the collector is unreachable."""
+        if not os.path.isdir(self.spool_directory):
+            return True
+
+        for filename in sorted(os.listdir(self.spool_directory)):
+            path = os.path.join(self.spool_directory, filename)
+            with open(path, "rb") as fp:
+                result = self.post(fp.read())
+            if result is PostResult.UNDELIVERED:
+                return False
+
+            if result is PostResult.SENT:
+                self.sent += 1
+            else:
+                # Spooled batches are numbered already, so they can't be split
+                self.reject(filename.rsplit("-", 1)[0])
+            os.remove(path)
+        return True
+
+    def send(self, run_id, json_report):
+        reachable = self.flush_spool()
+
+        tests = json_report["tests"]
+        size = self.batch_size
+        # Reversed, so the next chunk to send is popped from the end
+        chunks = [tests[start : start + size] for start in range(0, len(tests), size)]
+        chunks = chunks[::-1] or [[]]
+        seq = 0
+        while chunks:
+            chunk = chunks.pop()
+            batch = make_batch(run_id, seq, chunk, None if chunks else json_report)
+            data = gzip.compress(json.dumps(batch).encode("utf-8"))
+
+            result = self.post(data) if reachable else PostResult.UNDELIVERED
+            if result is PostResult.TOO_LARGE and len(chunk) > 1:
+                half = len(chunk) // 2
+                chunks += [chunk[half:], chunk[:half]]
+                continue
+
+            if result is PostResult.SENT:
+                self.sent += 1
+            elif result is PostResult.UNDELIVERED:
+                reachable = False
+                self.spool(run_id, seq, data)
+            else:
+                self.reject(run_id)
+            seq += 1
+
+    def close(self):
+        self.session.close()
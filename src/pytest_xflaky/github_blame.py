@@ -3,10 +3,23 @@ import sys
 
 import requests
 
+from .github_users import (
+    Codeowners,
+    GithubUserResolver,
+    parse_mailmap,
+    parse_users_file,
+)
+
 
 class GithubBlame:
-    def __init__(self, token):
+    def __init__(self, token, *, users_file=None, mailmap_file=".mailmap"):
         self.token = token
+        self.resolver = GithubUserResolver(
+            self.get_github_user,
+            mailmap=parse_mailmap(mailmap_file),
+            users=parse_users_file(users_file),
+        )
+        self.codeowners = Codeowners.find()
 
     def blame(self, filename, lineno):
         blame_output = get_blame_output(filename, lineno)
@@ -32,14 +45,28 @@ class GithubBlame:
         try:
             author = hash_author_map[line_hash_map[lineno]]
         except KeyError:
-            return
+            # No author to resolve, the file owner is still worth reporting
+            codeowner = self.get_codeowner(filename)
+            if codeowner is None:
+                return
+            return {"email": None, "commit": None, "github_username": codeowner}
         else:
             return {
                 "email": author,
                 "commit": line_hash_map[lineno],
-                "github_username": self.get_github_user(author),
+                "github_username": self.resolver.resolve(author)
+                or self.get_codeowner(filename),
             }
 
+    def get_codeowner(self, filename):
+        if not self.codeowners:
+            return None
+
+        user = self.codeowners.user(filename)
+        if user:
+            self.resolver.stats["codeowners"] += 1
+        return user
+
     def get_github_user(self, email):
         url = f"https://api.github.com/search/commits?q=author-email:{email}"
 
@@ -50,7 +77,7 @@ class GithubBlame:
         try:
             if data["items"][0]["commit"]["author"]["email"] == email:
                 return data["items"][0]["author"]["login"]
-        except KeyError:
+        except (KeyError, IndexError, TypeError):
             return None
 
 
@@ -0,0 +1,166 @@
+import json
+import os
+import re
+from collections import Counter
+
+NOREPLY_RE = re.compile(
+    r"^(?:\d+\+)?(?P<login>[^@+]+)@users\.noreply\.github\.com$", re.IGNORECASE
+)
+MAILMAP_EMAIL_RE = re.compile(r"<([^>]*)>")
+CODEOWNERS_LOCATIONS = [".github/CODEOWNERS", "CODEOWNERS", "docs/CODEOWNERS"]
+
+
+def parse_mailmap(path):
+    """Return a commit email -> canonical email mapping from a .mailmap file."""
+    if not os.path.exists(path):
+        return {}
+
+    mailmap = {}
+    with open(path) as fp:
+        for line in fp:
+            line = line.split("#", 1)[0].strip()
+            emails = MAILMAP_EMAIL_RE.findall(line)
+            if len(emails) == 2 and emails[0]:
+                mailmap[emails[1].lower()] = emails[0]
+    return mailmap
+
+
+def parse_users_file(path):
+    """Return an email -> GitHub login mapping from a JSON file."""
+    if not path:
+        return {}
+
+    with open(path) as fp:
+        return {email.lower(): login for email, login in json.load(fp).items()}
+
+
+def codeowners_pattern_to_regex(pattern):
+    anchored = pattern.startswith("/") or "/" in pattern.strip("/")
+    directory = pattern.endswith("/")
+    pattern = pattern.strip("/")
+
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    prefix = "^" if anchored else "^(?:.*/)?"
+    if directory:
+        suffix = "/.*$"
+    elif pattern.endswith("/*"):
+        # "docs/*" matches files in docs/, but not in its subdirectories
+        suffix = "$"
+    else:
+        suffix = "(?:/.*)?$"
+    return re.compile(prefix + regex + suffix)
+
+
+class Codeowners:
+    def __init__(self, rules):
+        # The last matching pattern takes precedence, so keep them reversed
+        self.rules = [
+            (codeowners_pattern_to_regex(pattern), owners)
+            for pattern, owners in reversed(rules)
+        ]
+
+    @classmethod
+    def from_file(cls, path):
+        rules = []
+        with open(path) as fp:
+            for line in fp:
+                parts = line.split("#", 1)[0].split()
+                if parts:
+                    rules.append((parts[0], parts[1:]))
+        return cls(rules)
+
+    @classmethod
+    def find(cls, root="."):
+        for location in CODEOWNERS_LOCATIONS:
+            path = os.path.join(root, location)
+            if os.path.exists(path):
+                return cls.from_file(path)
+
+    def owners(self, filename):
+        filename = filename.removeprefix("./")
+        for regex, owners in self.rules:
+            if regex.match(filename):
+                return owners
+        return []
+
+    def user(self, filename):
+        """Return the first GitHub user owning a file, skipping teams and emails."""
+        for owner in self.owners(filename):
+            # Teams are written @org/team
+            if owner.startswith("@") and "/" not in owner:
+                return owner[1:]
+
+
+class GithubUserResolver:
+    """Resolve author emails to GitHub logins, trying local sources first.
+
+    Sources are tried in order: a cache of previous answers, GitHub noreply
+    addresses, a user provided email -> login mapping, and finally the GitHub
+    search API. Emails are also tried through their .mailmap canonical email.
+    Hits per source are counted in ``stats``.
+    """
+
+    def __init__(self, api_lookup, *, mailmap=None, users=None):
+        self.api_lookup = api_lookup
+        self.mailmap = mailmap or {}
+        self.users = users or {}
+        self.cache = {}
+        self.stats = Counter()
+
+    def resolve(self, email):
+        if email in self.cache:
+            self.stats["cache"] += 1
+            return self.cache[email]
+
+        login = self.resolve_locally(email)
+        if login is None:
+            self.stats["api"] += 1
+            login = self.api_lookup(email)
+
+        self.cache[email] = login
+        return login
+
+    def resolve_locally(self, email):
+        candidates = [(email, "")]
+        canonical = self.mailmap.get(email.lower())
+        if canonical and canonical.lower() != email.lower():
+            candidates.append((canonical, "mailmap:"))
+
+        for candidate, source_prefix in candidates:
+            if match := NOREPLY_RE.match(candidate):
+                self.stats[f"{source_prefix}noreply"] += 1
+                return match.group("login")
+
+            if login := self.users.get(candidate.lower()):
+                self.stats[f"{source_prefix}users_file"] += 1
+                return login
+
+    def format_stats(self):
+        # CODEOWNERS is only used once the API could not resolve an author
+        avoided = sum(
+            count
+            for source, count in self.stats.items()
+            if source not in {"api", "codeowners"}
+        )
+        sources = ", ".join(
+            f"{source}: {count}" for source, count in sorted(self.stats.items())
+        )
+        return f"GitHub users resolved ({sources}), API calls avoided: {avoided}"
@@ -0,0 +1,198 @@
+import bisect
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+# A test window is contended when any of these thresholds is reached
+CONTENTION_LOAD_PER_CPU = 1.0
+CONTENTION_STEAL = 10.0
+CONTENTION_MEMORY_PRESSURE = 10.0
+
+
+def read_file(path):
+    try:
+        with open(path) as fp:
+            return fp.read()
+    except OSError:
+        return None
+
+
+def read_cpu_times():
+    """Return ``(steal, total)`` jiffies from /proc/stat."""
+    stat = read_file("/proc/stat")
+    if not stat:
+        return None
+
+    values = [int(value) for value in stat.split("\n", 1)[0].split()[1:]]
+    # user nice system idle iowait irq softirq steal guest guest_nice, where
+    # guest times are already accounted in user and nice
+    steal = values[7] if len(values) > 7 else 0
+    return steal, sum(values[:8])
+
+
+def read_load_per_cpu():
+    """Return the 1 minute load average per CPU, None where it's not available."""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        # Windows has no load average
+        return None
+    return load / (os.cpu_count() or 1)
+
+
+def read_memory_pressure():
+    """Return the share of time some task stalled on memory (PSI avg10), in %."""
+    pressure = read_file("/proc/pressure/memory")
+    if not pressure:
+        return None
+
+    for field in pressure.split("\n", 1)[0].split():
+        if field.startswith("avg10="):
+            return float(field[6:])
+
+
+def read_rss():
+    status = read_file("/proc/self/status")
+    if not status:
+        return None
+
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+
+
+class HostSampler(threading.Thread):
+    """Background thread sampling host load while tests run.
+
+    Every sample records the load average per CPU, the CPU steal and memory
+    pressure percentages since the previous sample, and the RSS of this process.
+    The CPU time spent sampling is measured, and the thread waits long enough
+    after each sample that the next one keeps it under ``max_overhead`` of the
+    wall time, but never less than the configured interval. CPU time rather
+    than wall time, so waiting for the GIL behind a busy test thread doesn't
+    count as sampling cost.
+    """
+
+    def __init__(self, interval, *, max_overhead=0.01):
+        super().__init__(name="xflaky-host-sampler", daemon=True)
+        self.base_interval = interval
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.timestamps = []
+        self.samples = []
+        self.cost = 0.0
+        self.max_sample_cost = 0.0
+        self.started_at = None
+        self.stopped_at = None
+        self.previous_cpu_times = None
+        self.stop_event = threading.Event()
+
+    def sample(self):
+        cpu_times = read_cpu_times()
+        steal = None
+        if cpu_times and self.previous_cpu_times:
+            delta_total = cpu_times[1] - self.previous_cpu_times[1]
+            if delta_total > 0:
+                delta_steal = cpu_times[0] - self.previous_cpu_times[0]
+                steal = 100.0 * delta_steal / delta_total
+        self.previous_cpu_times = cpu_times
+
+        return {
+            "load_per_cpu": read_load_per_cpu(),
+            "steal": steal,
+            "memory_pressure": read_memory_pressure(),
+            "rss": read_rss(),
+        }
+
+    def run(self):
+        self.started_at = time.monotonic()
+        while not self.stop_event.is_set():
+            started = time.thread_time()
+            sample = self.sample()
+            timestamp = time.monotonic()
+            sample_cost = time.thread_time() - started
+            self.cost += sample_cost
+            self.max_sample_cost = max(self.max_sample_cost, sample_cost)
+
+            self.timestamps.append(timestamp)
+            self.samples.append(sample)
+            self.adjust_interval(timestamp - self.started_at)
+
+            self.stop_event.wait(self.interval)
+
+    def adjust_interval(self, elapsed):
+        """Set the wait before the next sample, at most as costly as any before.
+
+        Solves ``(cost + next_cost) / (elapsed + wait + next_cost)`` equal to
+        ``max_overhead``, so the wait shrinks back as cheap samples add up.
+        """
+        next_cost = self.max_sample_cost
+        wait = (self.cost + next_cost) / self.max_overhead - elapsed - next_cost
+        self.interval = max(wait, self.base_interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.stopped_at = time.monotonic()
+
+    def overhead(self):
+        """Return the CPU time spent sampling, as a share of the wall time."""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.stopped_at or time.monotonic()) - self.started_at
+        return self.cost / elapsed if elapsed > 0 else 0.0
+
+    def window(self, start, stop):
+        """Summarize the samples taken while a test was running.
+
+        Includes the last sample before ``start``, so tests shorter than the
+        sampling interval still get the host state they ran under.
+        """
+        lo = max(bisect.bisect_left(self.timestamps, start) - 1, 0)
+        hi = bisect.bisect_right(self.timestamps, stop)
+        samples = self.samples[lo:hi]
+        if not samples:
+            return None
+
+        summary = {}
+        for key in samples[0]:
+            values = [sample[key] for sample in samples if sample[key] is not None]
+            summary[key] = max(values) if values else None
+        return summary
+
+
+def is_contended(host):
+    def reached(key, threshold):
+        return host.get(key) is not None and host[key] >= threshold
+
+    return (
+        reached("load_per_cpu", CONTENTION_LOAD_PER_CPU)
+        or reached("steal", CONTENTION_STEAL)
+        or reached("memory_pressure", CONTENTION_MEMORY_PRESSURE)
+    )
+
+
+@dataclass
+class Contention:
+    """How many of the sampled runs of a test happened under host contention."""
+
+    failures: int = 0
+    contended_failures: int = 0
+    successes: int = 0
+    contended_successes: int = 0
+
+    def add(self, host, failure):
+        contended = is_contended(host)
+        if failure:
+            self.failures += 1
+            self.contended_failures += contended
+        else:
+            self.successes += 1
+            self.contended_successes += contended
+
+    def __str__(self):
+        return (
+            f"contended: failures {self.contended_failures}/{self.failures}, "
+            f"successes {self.contended_successes}/{self.successes}"
+        )
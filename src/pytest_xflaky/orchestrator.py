@@ -0,0 +1,143 @@
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Options handled by the orchestrator, that must not reach the worker runs
+STRIPPED_OPTIONS = {"--xflaky-runs", "--randomly-seed", "--xflaky-batch-id"}
+
+
+def seed_plan(runs, *, shuffle=True):
+    """Return the pytest-randomly seed of each run, None meaning no shuffling.
+
+    The plan is fixed, so sweeps are reproducible: one run in the original
+    order, followed by shuffled runs with seeds 1, 2, ... Without ``shuffle``
+    every run is in the original order.
+    """
+    if not shuffle:
+        return [None] * runs
+    return [None] + list(range(1, runs))
+
+
+def strip_args(args):
+    stripped = []
+    skip_value = False
+    for arg in args:
+        if skip_value:
+            skip_value = False
+            continue
+
+        name = arg.split("=", 1)[0]
+        if name in STRIPPED_OPTIONS:
+            skip_value = "=" not in arg
+            continue
+
+        stripped.append(arg)
+    return stripped
+
+
+@dataclass
+class CollectRun:
+    number: int
+    seed: int | None
+    directory: str
+    returncode: int | None = None
+
+    def __str__(self):
+        order = "ordered" if self.seed is None else f"seed {self.seed}"
+        return f"Run {self.number} ({order}): exit code {self.returncode}"
+
+
+class RunOrchestrator:
+    """Run ``pytest --xflaky-collect`` several times in parallel subprocesses.
+
+    Every run gets its own temporary directory for json report, basetemp,
+    cache and TMPDIR, and writes its collected run into the reports directory
+    with the batch id as filename prefix.
+    """
+
+    def __init__(
+        self,
+        args,
+        *,
+        rootdir,
+        reports_directory,
+        batch_id,
+        has_randomly,
+        workers,
+    ):
+        self.args = strip_args(args)
+        self.rootdir = rootdir
+        self.reports_directory = os.path.abspath(reports_directory)
+        self.batch_id = batch_id
+        self.has_randomly = has_randomly
+        self.workers = max(workers, 1)
+
+    def build_command(self, run):
+        command = [
+            sys.executable,
+            "-m",
+            "pytest",
+            *self.args,
+            "--xflaky-collect",
+            "--json-report",
+            f"--json-report-file={os.path.join(run.directory, 'report.json')}",
+            f"--xflaky-reports-directory={self.reports_directory}",
+            f"--xflaky-batch-id={self.batch_id}",
+            f"--basetemp={os.path.join(run.directory, 'basetemp')}",
+            "-o",
+            f"cache_dir={os.path.join(run.directory, 'cache')}",
+        ]
+
+        if run.seed is None:
+            command += ["-p", "no:randomly"]
+        else:
+            command += ["-p", "randomly", f"--randomly-seed={run.seed}"]
+
+        return command
+
+    def execute(self, run):
+        tmpdir = os.path.join(run.directory, "tmp")
+        os.makedirs(tmpdir, exist_ok=True)
+        env = {**os.environ, "TMPDIR": tmpdir}
+
+        with open(os.path.join(run.directory, "output.txt"), "w") as fp:
+            process = subprocess.run(
+                self.build_command(run),
+                cwd=self.rootdir,
+                env=env,
+                stdout=fp,
+                stderr=subprocess.STDOUT,
+                check=False,
+            )
+        run.returncode = process.returncode
+        return run
+
+    def plan(self, runs, directory):
+        return [
+            CollectRun(
+                number=number,
+                seed=seed,
+                directory=os.path.join(directory, str(number)),
+            )
+            for number, seed in enumerate(seed_plan(runs, shuffle=self.has_randomly))
+        ]
+
+    def run(self, runs):
+        with tempfile.TemporaryDirectory(prefix=f"xflaky-{self.batch_id}-") as tmp:
+            plan = self.plan(runs, tmp)
+            for run in plan:
+                os.makedirs(run.directory)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for run in executor.map(self.execute, plan):
+                    sys.stdout.write(f"{run}\n")
+                    # 0 and 1 mean the tests ran, whether they passed or not
+                    if run.returncode not in {0, 1}:
+                        with open(os.path.join(run.directory, "output.txt")) as fp:
+                            sys.stdout.write(fp.read())
+                    sys.stdout.flush()
+
+        return plan
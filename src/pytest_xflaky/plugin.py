@@ -1,23 +1,36 @@
 import enum
+import heapq
 import json
 import os
 import shutil
 import sys
+import tempfile
+import time
 import uuid
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from xml.sax.saxutils import quoteattr
 
 import pytest
 from pytest_jsonreport.plugin import pytest_configure as jsonreport_pytest_configure
 from pytest_xflaky.add_decorator import add_decorators
 
+from .collector import SPOOL_DIRECTORY, TOKEN_ENV, CollectorClient
 from .github_blame import GithubBlame
+from .host_sampler import Contention, HostSampler
+from .orchestrator import RunOrchestrator
+from .polluters import PolluterFinder, SubprocessRunner, get_run_order
+from .query import QueryIndexBuilder
+from .run_index import RunIndex
+from .signatures import FailureCluster, FailureClusters, failure_signature
 
 
 class XflakyAction(enum.Enum):
+    BISECT = "bisect"
     COLLECT = "collect"
     FIX = "fix"
     REPORT = "report"
+    RUNS = "runs"
 
 
 @dataclass
@@ -47,77 +60,336 @@ class MaybeFlakyTest:
     failed: int
     min_failures: bool
     min_successes: bool
+    # Number of failures per failure signature id
+    signatures: dict[str, int] = field(default_factory=dict)
+    # Only set when runs were collected with --xflaky-host-sampling
+    contention: Contention | None = None
 
     def is_flaky(self):
         return self.ok >= self.min_successes and self.failed >= self.min_failures
 
 
+@dataclass
+class ReportSummary:
+    """Totals of a report, computed while streaming tests to the writers."""
+
+    clusters: FailureClusters
+    # GitHub user owning each flaky test, by (nodeid, faillineno), filled while
+    # adding tests by GitHubReportWriter
+    owners: dict[tuple[str, int], str] = field(default_factory=dict)
+    tests: int = 0
+    successes: int = 0
+    failures: int = 0
+    flaky: int = 0
+
+    @property
+    def runs(self):
+        return self.successes + self.failures
+
+    def add(self, maybe_flaky_test: MaybeFlakyTest):
+        self.tests += 1
+        self.successes += maybe_flaky_test.ok
+        self.failures += maybe_flaky_test.failed
+        self.flaky += maybe_flaky_test.is_flaky()
+        self.clusters.add(maybe_flaky_test)
+
+    def __str__(self):
+        return f"Flaky tests result (tests: {self.tests}, runs: {self.runs}, successes: {self.successes}, failures: {self.failures}, flaky: {self.flaky})"
+
+
+# Size of the buffers of report files
+WRITE_BUFFER_SIZE = 1 << 20
+
+
 class TextFileReportWriter:
-    def __init__(self, config):
+    """Writes every failed test to the text report, and the top ones to stdout."""
+
+    cluster_tests_limit = 10
+
+    @classmethod
+    def enabled(cls, config):
+        return True
+
+    def __init__(self, config, summary: ReportSummary):
         self.text_report_file = config.option.xflaky_text_report_file
-        self.fp = open(self.text_report_file, "w")
+        self.console_top = config.option.xflaky_console_top
+        self.fp = open(self.text_report_file, "w", buffering=WRITE_BUFFER_SIZE)
+        self.fp.write("FAILED TESTS:\n")
+        # Heap with the top failed tests to print, flaky and most failed first
+        self.console_tests = []
+        self.failed_tests = 0
 
     def close(self):
         self.fp.close()
 
-    def _print(self, line):
-        line = f"{line}\n"
-        sys.stdout.write(line)
-        self.fp.write(line)
-
-    def write(self, tests: list[MaybeFlakyTest], flaky: int):
-        self._print("FAILED TESTS:")
-        failed_tests = [test for test in tests if test.failed > 0]
-        for maybe_flaky_test in failed_tests:
-            label = " FLAKY" if maybe_flaky_test.is_flaky() else ""
-            self._print(
-                f"{maybe_flaky_test.test} (failed: {maybe_flaky_test.failed}/{maybe_flaky_test.ok + maybe_flaky_test.failed}){label}"
-            )
+    def format_test(self, maybe_flaky_test: MaybeFlakyTest):
+        label = " FLAKY" if maybe_flaky_test.is_flaky() else ""
+        contention = (
+            f" ({maybe_flaky_test.contention})" if maybe_flaky_test.contention else ""
+        )
+        return f"{maybe_flaky_test.test} (failed: {maybe_flaky_test.failed}/{maybe_flaky_test.ok + maybe_flaky_test.failed}){contention}{label}"
+
+    def add(self, maybe_flaky_test: MaybeFlakyTest):
+        if maybe_flaky_test.failed == 0:
+            return
 
-        failures = sum(test.failed for test in tests)
-        successes = sum(test.ok for test in tests)
-        runs = failures + successes
+        line = self.format_test(maybe_flaky_test)
+        self.fp.write(f"{line}\n")
 
-        self._print("-")
-        self._print(
-            f"Flaky tests result (tests: {len(tests)}, runs: {runs}, successes: {successes}, failures: {failures}, flaky: {flaky})",
+        item = (
+            maybe_flaky_test.is_flaky(),
+            maybe_flaky_test.failed,
+            -self.failed_tests,
+            line,
         )
+        if not self.console_top or len(self.console_tests) < self.console_top:
+            heapq.heappush(self.console_tests, item)
+        else:
+            heapq.heappushpop(self.console_tests, item)
+        self.failed_tests += 1
+
+    def format_clusters(self, clusters: list[FailureCluster]):
+        lines = ["-", "FLAKY FAILURE CLUSTERS:"]
+        for cluster in clusters:
+            lines.append(str(cluster))
+            for maybe_flaky_test in cluster.tests[: self.cluster_tests_limit]:
+                lines.append(f"    {maybe_flaky_test.test}")
+            more = len(cluster.tests) - self.cluster_tests_limit
+            if more > 0:
+                lines.append(f"    ... and {more} more")
+        return lines
+
+    def finish(self, summary: ReportSummary):
+        clusters = summary.clusters.sorted()
+
+        lines = []
+        if clusters:
+            lines += self.format_clusters(clusters)
+        lines += ["-", str(summary)]
+        self.fp.write("".join(f"{line}\n" for line in lines))
+
+        console_lines = ["FAILED TESTS:"]
+        if self.console_top:
+            # Printing every test takes seconds on large suites, the file has them all
+            console_tests = heapq.nlargest(self.console_top, self.console_tests)
+            clusters = clusters[: self.console_top]
+        else:
+            console_tests = sorted(self.console_tests, key=lambda item: -item[2])
+        console_lines += [line for *_, line in console_tests]
+
+        more = self.failed_tests - len(console_tests)
+        if more > 0:
+            console_lines.append(
+                f"... and {more} more failed tests in {self.text_report_file}"
+            )
+
+        if clusters:
+            console_lines += self.format_clusters(clusters)
+        console_lines += ["-", str(summary)]
+        sys.stdout.write("".join(f"{line}\n" for line in console_lines))
 
 
 class GitHubReportWriter:
-    def __init__(self, config):
+    @classmethod
+    def enabled(cls, config):
+        return config.option.xflaky_github_report
+
+    def __init__(self, config, summary: ReportSummary):
         self.config = config
+        self.summary = summary
 
-    def write(self, tests: list[MaybeFlakyTest], flaky: int):
         token = self.config.option.xflaky_github_token
         if not token:
             token = os.getenv("GITHUB_TOKEN")
 
-        failed_tests = [test for test in tests if test.failed > 0]
-        github_blame = GithubBlame(token)
-
-        report = {}
-        for maybe_flaky_test in failed_tests:
-            data = asdict(maybe_flaky_test)
-            data["is_flaky"] = maybe_flaky_test.is_flaky()
-            if data["is_flaky"]:
-                filename = maybe_flaky_test.test.get_filename()
-                faillineno = maybe_flaky_test.test.faillineno
-                data["blame"] = github_blame.blame(filename, faillineno)
-                if data["blame"]:
-                    report_key = data["blame"]["github_username"]
-                else:
-                    report_key = None
-
-                report.setdefault(report_key, []).append(data)
+        self.github_blame = GithubBlame(
+            token, users_file=self.config.option.xflaky_github_users_file
+        )
+        self.report = {}
+
+    def add(self, maybe_flaky_test: MaybeFlakyTest):
+        if not maybe_flaky_test.is_flaky():
+            return
+
+        data = asdict(maybe_flaky_test)
+        data["is_flaky"] = True
+        filename = maybe_flaky_test.test.get_filename()
+        faillineno = maybe_flaky_test.test.faillineno
+        data["blame"] = self.github_blame.blame(filename, faillineno)
+        if data["blame"]:
+            report_key = data["blame"]["github_username"]
+            self.summary.owners[(maybe_flaky_test.test.nodeid, faillineno)] = report_key
+        else:
+            report_key = None
+
+        self.report.setdefault(report_key, []).append(data)
+
+    def finish(self, summary: ReportSummary):
+        # Cluster sizes are only known once every test was seen
+        clusters = summary.clusters.by_id
+        for tests in self.report.values():
+            for data in tests:
+                data["clusters"] = [
+                    {
+                        **clusters[signature_id].signature,
+                        "failures": failures,
+                        "cluster_tests": len(clusters[signature_id].tests),
+                    }
+                    for signature_id, failures in data["signatures"].items()
+                ]
 
         with open(self.config.option.xflaky_github_report_file, "w") as fp:
-            json.dump(report, fp)
+            json.dump(self.report, fp)
+
+        sys.stdout.write(f"{self.github_blame.resolver.format_stats()}\n")
 
     def close(self):
         pass
 
 
+class JsonLinesReportWriter:
+    """Writes one JSON object per test."""
+
+    @classmethod
+    def enabled(cls, config):
+        return bool(config.option.xflaky_jsonl_report_file)
+
+    def __init__(self, config, summary: ReportSummary):
+        self.fp = open(  # noqa: SIM115
+            config.option.xflaky_jsonl_report_file, "w", buffering=WRITE_BUFFER_SIZE
+        )
+
+    def add(self, maybe_flaky_test: MaybeFlakyTest):
+        record = {
+            "nodeid": maybe_flaky_test.test.nodeid,
+            "faillineno": maybe_flaky_test.test.faillineno,
+            "testlineno": maybe_flaky_test.test.testlineno,
+            "ok": maybe_flaky_test.ok,
+            "failed": maybe_flaky_test.failed,
+            "is_flaky": maybe_flaky_test.is_flaky(),
+            "signatures": maybe_flaky_test.signatures,
+            "contention": (
+                asdict(maybe_flaky_test.contention)
+                if maybe_flaky_test.contention
+                else None
+            ),
+        }
+        self.fp.write(f"{json.dumps(record)}\n")
+
+    def finish(self, summary: ReportSummary):
+        pass
+
+    def close(self):
+        self.fp.close()
+
+
+class JUnitXmlReportWriter:
+    """Writes a JUnit XML report where flaky tests are failures.
+
+    Test cases are streamed to a temporary file, since the testsuite element
+    needs the totals before them.
+    """
+
+    @classmethod
+    def enabled(cls, config):
+        return bool(config.option.xflaky_junit_report_file)
+
+    def __init__(self, config, summary: ReportSummary):
+        self.path = config.option.xflaky_junit_report_file
+        self.body = tempfile.TemporaryFile(  # noqa: SIM115
+            "w+", buffering=WRITE_BUFFER_SIZE
+        )
+
+    def add(self, maybe_flaky_test: MaybeFlakyTest):
+        path, _, name = maybe_flaky_test.test.nodeid.partition("::")
+        classname = path.removesuffix(".py").replace("/", ".")
+        if "::" in name:
+            parents, name = name.rsplit("::", 1)
+            classname = f"{classname}.{parents.replace('::', '.')}"
+
+        self.body.write(
+            f"<testcase classname={quoteattr(classname)} name={quoteattr(name)} "
+            f'file={quoteattr(path)} line="{maybe_flaky_test.test.faillineno}">'
+        )
+        if maybe_flaky_test.is_flaky():
+            runs = maybe_flaky_test.ok + maybe_flaky_test.failed
+            message = f"flaky: failed {maybe_flaky_test.failed}/{runs}"
+            self.body.write(f'<failure message={quoteattr(message)} type="flaky"/>')
+        self.body.write("</testcase>\n")
+
+    def finish(self, summary: ReportSummary):
+        with open(self.path, "w", buffering=WRITE_BUFFER_SIZE) as fp:
+            fp.write('<?xml version="1.0" encoding="utf-8"?>\n')
+            fp.write(
+                f'<testsuites><testsuite name="xflaky" tests="{summary.tests}" '
+                f'failures="{summary.flaky}" errors="0" skipped="0">\n'
+            )
+            self.body.seek(0)
+            shutil.copyfileobj(self.body, fp)
+            fp.write("</testsuite></testsuites>\n")
+
+    def close(self):
+        self.body.close()
+
+
+class QueryIndexReportWriter:
+    @classmethod
+    def enabled(cls, config):
+        return True
+
+    def __init__(self, config, summary: ReportSummary):
+        self.builder = QueryIndexBuilder(config.option.xflaky_query_index_file)
+
+    def add(self, maybe_flaky_test: MaybeFlakyTest):
+        self.builder.add(maybe_flaky_test)
+
+    def finish(self, summary: ReportSummary):
+        self.builder.set_owners(summary.owners)
+        self.builder.finish()
+
+    def close(self):
+        self.builder.close()
+
+
+# A report writer is built with the config and the `ReportSummary` of the report
+# when its ``enabled(config)`` class method is true. Every test is passed to
+# ``add`` of every writer before any ``finish(summary)``, so what writers put
+# in the summary while adding tests (e.g. owners) is complete by then, whatever
+# their order. ``close`` is always called, even if the report failed.
+REPORT_WRITERS = [
+    TextFileReportWriter,
+    GitHubReportWriter,
+    JsonLinesReportWriter,
+    JUnitXmlReportWriter,
+    QueryIndexReportWriter,
+]
+
+
+def write_reports(
+    config, tests, signatures, writer_classes=REPORT_WRITERS
+) -> ReportSummary:
+    """Stream tests once through every enabled report writer."""
+    summary = ReportSummary(clusters=FailureClusters(signatures))
+    report_writers = []
+    try:
+        for writer_class in writer_classes:
+            if writer_class.enabled(config):
+                report_writers.append(writer_class(config, summary))
+
+        for maybe_flaky_test in tests:
+            summary.add(maybe_flaky_test)
+            for report_writer in report_writers:
+                report_writer.add(maybe_flaky_test)
+
+        for report_writer in report_writers:
+            report_writer.finish(summary)
+    finally:
+        for report_writer in report_writers:
+            report_writer.close()
+
+    return summary
+
+
 class Plugin:
     def __init__(self, config, action: XflakyAction):
         self.config = config
@@ -130,6 +402,10 @@ class Plugin:
                 self.action_report()
             case XflakyAction.FIX:
                 self.action_fix()
+            case XflakyAction.BISECT:
+                self.action_bisect()
+            case XflakyAction.RUNS:
+                self.action_runs()
             case _:
                 raise NotImplementedError(action)
 
@@ -139,34 +415,110 @@ class Plugin:
 
         report_file = self.config.option.json_report_file
         directory = Path(self.config.option.xflaky_reports_directory)
-        filename = f"{uuid.uuid4()}-{os.path.basename(report_file)}"
+        self.run_id = str(uuid.uuid4())
+        filename = f"{self.run_id}-{os.path.basename(report_file)}"
+        if self.config.option.xflaky_batch_id:
+            filename = f"{self.config.option.xflaky_batch_id}-{filename}"
         self.new_report_file = str(directory / filename)
 
-    def action_report(self):
+        self.collector_client = None
+        if self.config.option.xflaky_collector_url:
+            self.collector_client = CollectorClient(
+                self.config.option.xflaky_collector_url,
+                str(directory / SPOOL_DIRECTORY),
+                token=os.environ.get(TOKEN_ENV),
+                batch_size=self.config.option.xflaky_collector_batch_size,
+            )
+
+        self.host_sampler = None
+        self.test_windows = {}
+        if self.config.option.xflaky_host_sampling:
+            self.host_sampler = HostSampler(
+                self.config.option.xflaky_host_sampling_interval
+            )
+            self.host_sampler.start()
+
+    def action_report(self, batch_id=None):
         finder = FlakyTestFinder(
             directory=self.config.option.xflaky_reports_directory,
             min_failures=self.config.option.xflaky_min_failures,
             min_successes=self.config.option.xflaky_min_successes,
+            batch_id=batch_id,
         )
 
-        tests, flaky = finder.run()
-
-        report_writers = [
-            TextFileReportWriter(self.config),
-        ]
-
-        if self.config.option.xflaky_github_report:
-            report_writers.append(GitHubReportWriter(self.config))
+        summary = write_reports(self.config, finder.iter_tests(), finder.signatures)
+        if finder.duplicates:
+            sys.stdout.write(f"Skipped {finder.duplicates} duplicate runs\n")
 
-        for report_writer in report_writers:
-            report_writer.write(tests, flaky)
-            report_writer.close()
-
-        if flaky > 0:
+        if summary.flaky > 0:
             pytest.exit("Flaky tests were found", returncode=1)
         else:
             pytest.exit("No flaky tests found", returncode=0)
 
+    def action_bisect(self):
+        target = self.config.option.xflaky_bisect
+        directory = self.config.option.xflaky_reports_directory
+
+        finder = FlakyTestFinder(
+            directory=directory,
+            min_failures=self.config.option.xflaky_min_failures,
+            min_successes=self.config.option.xflaky_min_successes,
+        )
+        order = finder.find_failing_order(target)
+        if order is None:
+            pytest.exit(f"No collected run where {target} failed", returncode=1)
+
+        candidates = order[: order.index(target)]
+        sys.stdout.write(
+            f"Bisecting {len(candidates)} tests executed before {target}\n"
+        )
+
+        polluter_finder = PolluterFinder(
+            SubprocessRunner(target, rootdir=str(self.config.rootpath)),
+            workers=self.config.option.xflaky_bisect_workers or os.cpu_count(),
+        )
+        polluters = polluter_finder.run(candidates)
+        if polluters is None:
+            pytest.exit(
+                f"Could not reproduce: {target} fails on its own or passes after "
+                "the tests executed before it",
+                returncode=1,
+            )
+
+        sys.stdout.write(
+            f"POLLUTERS ({polluter_finder.batches} batches of "
+            f"{polluter_finder.workers} runs):\n"
+        )
+        for nodeid in polluters:
+            sys.stdout.write(f"{nodeid}\n")
+
+        pytest.exit("Polluters found", returncode=0)
+
+    def action_runs(self):
+        self.make_reports_dir()
+
+        batch_id = uuid.uuid4().hex[:12]
+        runs = self.config.option.xflaky_runs
+        sys.stdout.write(f"Running {runs} collect runs in batch {batch_id}\n")
+
+        has_randomly = self.config.pluginmanager.hasplugin("randomly")
+        if not has_randomly and runs > 1:
+            sys.stdout.write(
+                "pytest-randomly is not installed, all runs use the original order\n"
+            )
+
+        orchestrator = RunOrchestrator(
+            self.config.invocation_params.args,
+            rootdir=str(self.config.invocation_params.dir),
+            reports_directory=self.config.option.xflaky_reports_directory,
+            batch_id=batch_id,
+            has_randomly=has_randomly,
+            workers=os.cpu_count() or 1,
+        )
+        orchestrator.run(runs)
+
+        self.action_report(batch_id=batch_id)
+
     def action_fix(self):
         add_decorators(self.config.option.xflaky_text_report_file)
 
@@ -185,25 +537,95 @@ class Plugin:
         except FileExistsError:
             pass
 
+    def pytest_runtest_logstart(self, nodeid, location):
+        self.test_windows[nodeid] = (time.monotonic(), None)
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        start, _ = self.test_windows[nodeid]
+        self.test_windows[nodeid] = (start, time.monotonic())
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_json_modifyreport(self, json_report):
+        for test in json_report["tests"]:
+            if signature := failure_signature(test, json_report["root"]):
+                test["xflaky_signature"] = signature
+
+        if self.host_sampler:
+            self.host_sampler.stop()
+            for test in json_report["tests"]:
+                start, stop = self.test_windows.get(test["nodeid"], (None, None))
+                if stop is not None:
+                    test["xflaky_host"] = self.host_sampler.window(start, stop)
+
+        # Tests are already listed in execution order, see get_run_order
+        json_report["xflaky"] = {
+            "run_id": self.run_id,
+            "batch_id": self.config.option.xflaky_batch_id,
+            "seed": getattr(self.config.option, "randomly_seed", None),
+        }
+
     @pytest.hookimpl(trylast=True)
     def pytest_sessionfinish(self, session):
         report_file = self.config.option.json_report_file
         shutil.copy(report_file, self.new_report_file)
 
+        # Fingerprint the run now, so ingestion only has to compare run ids
+        run_index = RunIndex(self.config.option.xflaky_reports_directory)
+        run_index.fingerprint(
+            os.path.basename(self.new_report_file), run_id=self.run_id
+        )
+        run_index.save()
+
+        if self.collector_client:
+            with open(self.new_report_file) as fp:
+                self.collector_client.send(self.run_id, json.load(fp))
+            self.collector_client.close()
+
     def pytest_terminal_summary(self, terminalreporter):
         terminalreporter.write_sep("-", "XFLAKY report")
         terminalreporter.write_line(f"Report file copied to {self.new_report_file}")
+        if self.collector_client:
+            terminalreporter.write_line(
+                f"Batches sent to {self.config.option.xflaky_collector_url}: "
+                f"{self.collector_client.sent}, "
+                f"spooled for retry: {self.collector_client.spooled}, "
+                f"rejected: {self.collector_client.rejected}"
+            )
+            for run_id in sorted(self.collector_client.incomplete_runs):
+                terminalreporter.write_line(
+                    f"Run {run_id} is incomplete on the collector, some of its "
+                    "batches were rejected",
+                    red=True,
+                )
+        if self.host_sampler:
+            terminalreporter.write_line(
+                f"Host sampler: {len(self.host_sampler.samples)} samples, "
+                f"{self.host_sampler.cost * 1000:.1f}ms "
+                f"({self.host_sampler.overhead():.2%} of wall time)"
+            )
 
 
 class FlakyTestFinder:
-    def __init__(self, *, directory: str, min_failures: int, min_successes: int):
+    def __init__(
+        self,
+        *,
+        directory: str,
+        min_failures: int,
+        min_successes: int,
+        batch_id: str | None = None,
+    ):
         self.directory = directory
         self.min_failures = min_failures
         self.min_successes = min_successes
+        self.batch_id = batch_id
+        self.duplicates = 0
+        # Details of every failure signature found, by signature id
+        self.signatures = {}
 
-    def run(self) -> list[MaybeFlakyTest]:
+    def iter_tests(self):
+        """Aggregate every collected run, then yield each test once."""
         cache = {}
-        for test, failure in self.collect_tests():
+        for test, failure, signature, host in self.collect_tests():
             cache.setdefault(
                 test,
                 MaybeFlakyTest(
@@ -215,19 +637,55 @@ class FlakyTestFinder:
                 ),
             )
 
+            if host:
+                if cache[test].contention is None:
+                    cache[test].contention = Contention()
+                cache[test].contention.add(host, failure)
+
             if failure:
                 cache[test].failed += 1
+                if signature:
+                    signature_id = signature["id"]
+                    self.signatures.setdefault(signature_id, signature)
+                    signatures = cache[test].signatures
+                    signatures[signature_id] = signatures.get(signature_id, 0) + 1
             else:
                 cache[test].ok += 1
 
-        tests = list(cache.values())
-        flaky_total = sum(1 for test in tests if test.is_flaky())
-        return tests, flaky_total
+        yield from cache.values()
 
     def collect_tests(self):
-        for f in os.listdir(self.directory):
-            if f.endswith(".json"):
-                yield from self.iter_parse_file(f)
+        for f in self.iter_unique_files():
+            yield from self.iter_parse_file(f)
+
+    def iter_unique_files(self):
+        filenames = sorted(f for f in os.listdir(self.directory) if f.endswith(".json"))
+
+        run_index = RunIndex(self.directory)
+        run_index.prune(filenames)
+        if self.batch_id:
+            filenames = [f for f in filenames if f.startswith(f"{self.batch_id}-")]
+        unique = 0
+        for filename in run_index.iter_unique(filenames):
+            unique += 1
+            yield filename
+        run_index.save()
+
+        self.duplicates = len(filenames) - unique
+
+    def find_failing_order(self, nodeid):
+        """Return the execution order of a collected run where nodeid failed."""
+        order = None
+        for filename in self.iter_unique_files():
+            if order is not None:
+                continue
+
+            for test, failure, _, _ in self.iter_parse_file(filename):
+                if test.nodeid == nodeid and failure:
+                    with open(f"{self.directory}/{filename}") as f:
+                        order = get_run_order(json.load(f))
+                    break
+        return order
 
     def iter_parse_file(self, filename):
         outcomes = {"error", "failed"}
@@ -239,13 +697,24 @@ class FlakyTestFinder:
                     faillineno = test["call"]["traceback"][0]["lineno"]
                 except (KeyError, IndexError):
                     faillineno = testlineno
+
+                failure = test["outcome"] in outcomes
+                signature = None
+                if failure:
+                    # Runs collected by older versions don't have signatures
+                    signature = test.get("xflaky_signature") or failure_signature(
+                        test, data.get("root")
+                    )
+
                 yield (
                     Test(
                         nodeid=test["nodeid"],
                         testlineno=testlineno,
                         faillineno=faillineno,
                     ),
-                    test["outcome"] in outcomes,
+                    failure,
+                    signature,
+                    test.get("xflaky_host"),
                 )
 
 
@@ -264,6 +733,24 @@ def xflaky_action_from_config(config) -> XflakyAction:
 
         action = XflakyAction.FIX
 
+    if config.option.xflaky_bisect:
+        if action:
+            pytest.exit(
+                "Cannot use more than one xflaky action at a time, found: --xflaky-bisect",
+                returncode=1,
+            )
+
+        action = XflakyAction.BISECT
+
+    if config.option.xflaky_runs:
+        if action:
+            pytest.exit(
+                "Cannot use more than one xflaky action at a time, found: --xflaky-runs",
+                returncode=1,
+            )
+
+        action = XflakyAction.RUNS
+
     if config.option.xflaky_collect:
         if action:
             pytest.exit(
@@ -293,11 +780,63 @@ def pytest_addoption(parser):
         action="store_true",
         help="Collect flaky tests",
     )
+    group.addoption(
+        "--xflaky-runs",
+        default=0,
+        metavar="N",
+        help="Run N collect runs in parallel (one in order, the others shuffled "
+        "with pytest-randomly), then generate the report",
+        type=int,
+    )
+    group.addoption(
+        "--xflaky-batch-id",
+        default=None,
+        help="Prefix for collected runs filenames (set by --xflaky-runs)",
+    )
+    group.addoption(
+        "--xflaky-collector-url",
+        default=None,
+        help="Also send collected runs to an xflaky collector (see `xflaky collector`)",
+    )
+    group.addoption(
+        "--xflaky-collector-batch-size",
+        default=500,
+        help="Number of test records per batch sent to the collector",
+        type=int,
+    )
+    group.addoption(
+        "--xflaky-host-sampling",
+        default=False,
+        action="store_true",
+        help="Sample host load, CPU steal, memory pressure and RSS while collecting",
+    )
+    group.addoption(
+        "--xflaky-host-sampling-interval",
+        default=0.5,
+        help="Seconds between host samples (increased if sampling gets expensive)",
+        type=float,
+    )
     group.addoption(
         "--xflaky-text-report-file",
         default=".xflaky_report.txt",
         help="File to store text report",
     )
+    group.addoption(
+        "--xflaky-console-top",
+        default=20,
+        help="Number of failed tests (and clusters) printed to the console, 0 for all",
+        type=int,
+    )
+    group.addoption(
+        "--xflaky-jsonl-report-file",
+        default=None,
+        help="File to store a JSON lines report, one line per test",
+    )
+    group.addoption(
+        "--xflaky-junit-report-file",
+        default=None,
+        help="File to store a JUnit XML report, where flaky tests are failures",
+    )
     group.addoption(
         "--xflaky-github-report",
         default=False,
@@ -309,11 +848,21 @@ def pytest_addoption(parser):
         default="",
         help="GitHub token to use for API requests (defaults to GITHUB_TOKEN)",
     )
+    group.addoption(
+        "--xflaky-github-users-file",
+        default=None,
+        help="JSON file mapping author emails to GitHub users, checked before the API",
+    )
     group.addoption(
         "--xflaky-github-report-file",
         default=".xflaky_report_github.json",
         help="File to store GitHub report",
     )
+    group.addoption(
+        "--xflaky-query-index-file",
+        default=".xflaky_query_index.db",
+        help="File to store the index used by `xflaky query`",
+    )
     group.addoption(
         "--xflaky-reports-directory",
         default=".reports",
@@ -331,6 +880,19 @@ def pytest_addoption(parser):
         action="store_true",
         help="Fix flaky tests",
     )
+    group.addoption(
+        "--xflaky-bisect",
+        default=None,
+        metavar="NODEID",
+        help="Find the tests that make NODEID fail when executed before it",
+    )
+    group.addoption(
+        "--xflaky-bisect-workers",
+        default=None,
+        help="Number of pytest subprocesses to run concurrently when bisecting "
+        "(defaults to the number of CPUs)",
+        type=int,
+    )
     group.addoption(
         "--xflaky-min-failures",
         default=1,
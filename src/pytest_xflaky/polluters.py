@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+
+def get_run_order(data):
+    """Return the nodeids of a json report in the order they were executed.
+
+    pytest-json-report adds a test to the report on its first log report, so
+    the report lists tests in execution order, shuffled or not.
+    """
+    return [test["nodeid"] for test in data["tests"]]
+
+
+def split(items, n):
+    size, remainder = divmod(len(items), n)
+    chunks = []
+    start = 0
+    for i in range(n):
+        stop = start + size + (1 if i < remainder else 0)
+        chunks.append(items[start:stop])
+        start = stop
+    return chunks
+
+
+class PolluterFinder:
+    """Find a minimal set of tests that make a target test fail when run before it.
+
+    This is delta debugging (ddmin) where the chunks of a round, then their
+    complements if no chunk reproduces, are evaluated concurrently. ``batches``
+    counts the waves of at most ``workers`` concurrent pytest runs, which is
+    what bounds the wall time.
+    """
+
+    def __init__(self, reproduces, *, workers):
+        self.reproduces = reproduces
+        self.workers = max(workers, 1)
+        self.cache = {}
+        self.batches = 0
+
+    def evaluate(self, executor, subsets):
+        pending = list(
+            dict.fromkeys(
+                tuple(subset) for subset in subsets if tuple(subset) not in self.cache
+            )
+        )
+        if pending:
+            self.batches += -(-len(pending) // self.workers)
+            results = executor.map(self.reproduces, pending)
+            self.cache.update(zip(pending, results))
+        return [self.cache[tuple(subset)] for subset in subsets]
+
+    def minimize(self, executor, candidates):
+        n = min(self.workers, len(candidates))
+        while len(candidates) >= 2:
+            n = max(n, 2)
+            chunks = split(candidates, n)
+            chunk_results = self.evaluate(executor, chunks)
+            if True in chunk_results:
+                candidates = chunks[chunk_results.index(True)]
+                n = min(self.workers, len(candidates))
+                continue
+
+            complements = []
+            if n > 2:
+                complements = [
+                    [test for chunk in chunks[:i] + chunks[i + 1 :] for test in chunk]
+                    for i in range(n)
+                ]
+            complement_results = self.evaluate(executor, complements)
+            if True in complement_results:
+                candidates = complements[complement_results.index(True)]
+                n -= 1
+            elif n < len(candidates):
+                n = min(n * 2, len(candidates))
+            else:
+                break
+
+        return candidates
+
+    def run(self, candidates):
+        """Return the minimal polluter list, or None if it cannot be reproduced."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # The target must pass on its own, and fail after all candidates
+            alone, after_candidates = self.evaluate(executor, [[], candidates])
+            if alone or not after_candidates:
+                return None
+            return self.minimize(executor, candidates)
+
+
+class SubprocessRunner:
+    """Run a target test after other tests in an isolated pytest subprocess."""
+
+    def __init__(self, target, *, rootdir):
+        self.target = target
+        self.rootdir = rootdir
+
+    def __call__(self, tests):
+        with tempfile.TemporaryDirectory(prefix="xflaky-bisect-") as tmpdir:
+            args_file = os.path.join(tmpdir, "args")
+            report_file = os.path.join(tmpdir, "report.json")
+            with open(args_file, "w") as fp:
+                fp.write("\n".join([*tests, self.target]))
+
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "pytest",
+                    "-q",
+                    "-p",
+                    "no:randomly",
+                    "-p",
+                    "no:cacheprovider",
+                    f"--rootdir={self.rootdir}",
+                    f"--basetemp={os.path.join(tmpdir, 'basetemp')}",
+                    "--json-report",
+                    f"--json-report-file={report_file}",
+                    f"@{args_file}",
+                ],
+                cwd=self.rootdir,
+                check=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+            try:
+                with open(report_file) as fp:
+                    data = json.load(fp)
+            except FileNotFoundError:
+                return False
+
+        for test in data["tests"]:
+            if test["nodeid"] == self.target:
+                return test["outcome"] in {"error", "failed"}
+        return False
@@ -0,0 +1,292 @@
+import os
+import sqlite3
+
+INDEX_VERSION = 2
+
+# Positions of the fields of each test returned by `QueryIndex.query`
+NODEID, FAILLINENO, OK, FAILED, FLAKY, OWNER = range(6)
+
+# Sort keys of `QueryIndex.query`, mapped to their column
+SORT_KEYS = {
+    "failure-rate": "failure_rate",
+    "failures": "failed",
+    "score": "score",
+}
+
+INSERT_BATCH_SIZE = 10_000
+
+SCHEMA = """
+CREATE TABLE tests (
+    nodeid TEXT NOT NULL,
+    faillineno INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    flaky INTEGER NOT NULL,
+    owner TEXT,
+    failure_rate REAL NOT NULL,
+    score REAL NOT NULL
+);
+
+CREATE TABLE nodes (
+    nodeid TEXT PRIMARY KEY,
+    parent TEXT,
+    name TEXT NOT NULL,
+    tests INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    flaky INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Indexes are created once all tests are inserted. Only failed tests can be
+# returned by a query, so the sort and owner indexes skip the others.
+INDEXES = """
+CREATE UNIQUE INDEX tests_nodeid ON tests (nodeid, faillineno);
+CREATE INDEX tests_owner ON tests (owner, nodeid) WHERE owner IS NOT NULL;
+CREATE INDEX tests_failure_rate ON tests (failure_rate DESC) WHERE failed > 0;
+CREATE INDEX tests_failed ON tests (failed DESC) WHERE failed > 0;
+CREATE INDEX tests_score ON tests (score DESC) WHERE failed > 0;
+CREATE INDEX nodes_parent ON nodes (parent, name);
+"""
+
+
+def iter_parents(nodeid):
+    """Yield ``(nodeid, name)`` of the directories, module and classes of a test."""
+    path, sep, rest = nodeid.partition("::")
+    parent = ""
+    for segment in path.split("/")[: None if sep else -1]:
+        parent = f"{parent}/{segment}" if parent else segment
+        yield parent, segment
+
+    for segment in rest.split("::")[:-1] if sep else []:
+        parent = f"{parent}::{segment}"
+        yield parent, segment
+
+
+def normalize_prefix(prefix):
+    return prefix.rstrip("/").removesuffix("::")
+
+
+def next_key(key):
+    """Return the smallest string greater than every string starting with key."""
+    return key[:-1] + chr(ord(key[-1]) + 1)
+
+
+def failure_rate(ok, failed):
+    runs = ok + failed
+    return failed / runs if runs else 0.0
+
+
+def score(ok, failed):
+    """Flakiness score: 1.0 when failing half of the runs, 0.0 when stable."""
+    runs = ok + failed
+    return 2 * min(ok, failed) / runs if runs else 0.0
+
+
+class QueryIndexBuilder:
+    """Write a query index to a sqlite database, one `MaybeFlakyTest` at a time.
+
+    Tests are inserted in batches, so only the counts rolled up per directory,
+    module and class stay in memory. The database is written next to ``path``
+    and moved in place by `finish`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+        self.connection = sqlite3.connect(self.tmp_path)
+        self.connection.executescript(
+            "PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA
+        )
+        self.rows = []
+        self.owners = {}
+        # nodeid -> [parent, name, tests, ok, failed, flaky], "" is the root
+        self.nodes = {"": [None, "", 0, 0, 0, 0]}
+
+    def add(self, maybe_flaky_test):
+        test = maybe_flaky_test.test
+        ok, failed = maybe_flaky_test.ok, maybe_flaky_test.failed
+        flaky = int(maybe_flaky_test.is_flaky())
+
+        parent = ""
+        parents = [self.nodes[""]]
+        for nodeid, name in iter_parents(test.nodeid):
+            node = self.nodes.get(nodeid)
+            if node is None:
+                node = self.nodes[nodeid] = [parent, name, 0, 0, 0, 0]
+            parents.append(node)
+            parent = nodeid
+
+        for node in parents:
+            node[2] += 1
+            node[3] += ok
+            node[4] += failed
+            node[5] += flaky
+
+        self.rows.append(
+            (
+                test.nodeid,
+                test.faillineno,
+                ok,
+                failed,
+                flaky,
+                None,
+                failure_rate(ok, failed),
+                score(ok, failed),
+            )
+        )
+        if len(self.rows) >= INSERT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.connection.executemany(
+            "INSERT INTO tests VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self.rows
+        )
+        self.rows = []
+
+    def set_owners(self, owners):
+        """Set owners from a ``{(nodeid, faillineno): owner}`` mapping."""
+        self.owners = owners
+
+    def finish(self):
+        self.flush()
+        self.connection.executemany(
+            "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((nodeid, *node) for nodeid, node in self.nodes.items()),
+        )
+        self.connection.executescript(INDEXES)
+        self.connection.executemany(
+            "UPDATE tests SET owner = ? WHERE nodeid = ? AND faillineno = ?",
+            (
+                (owner, nodeid, faillineno)
+                for (nodeid, faillineno), owner in self.owners.items()
+            ),
+        )
+        self.connection.execute("ANALYZE")
+        self.connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.connection.commit()
+        self.connection.close()
+        os.replace(self.tmp_path, self.path)
+
+    def close(self):
+        """Discard the index if it was not finished."""
+        if os.path.exists(self.tmp_path):
+            self.connection.close()
+            os.remove(self.tmp_path)
+
+
+def build_index(path, tests, owners=None):
+    """Write a query index for an iterable of `MaybeFlakyTest`."""
+    builder = QueryIndexBuilder(path)
+    try:
+        for maybe_flaky_test in tests:
+            builder.add(maybe_flaky_test)
+        builder.set_owners(owners or {})
+        builder.finish()
+    finally:
+        builder.close()
+
+
+class QueryIndex:
+    """Read a query index written by `QueryIndexBuilder`.
+
+    Queries only read the pages they need: a prefix is a range scan over the
+    nodeid index, and a top-K without prefix walks the index of the sort column.
+    """
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No xflaky query index at {path}")
+
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        except sqlite3.DatabaseError:
+            version = None
+        if version != INDEX_VERSION:
+            self.connection.close()
+            raise ValueError(f"Unsupported xflaky query index version in {path}")
+
+    def close(self):
+        self.connection.close()
+
+    def is_node(self, nodeid):
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM nodes WHERE nodeid = ? "
+                "UNION ALL SELECT 1 FROM tests WHERE nodeid = ? LIMIT 1",
+                (nodeid, nodeid),
+            ).fetchone()
+            is not None
+        )
+
+    def query(
+        self, prefix="", *, owner=None, flaky_only=False, sort="failure-rate", top=20
+    ):
+        """Return the top failed tests matching a nodeid prefix.
+
+        The last segment of the prefix may be partial (e.g. ``tests/bill``), in
+        which case every test starting with it matches.
+        """
+        conditions = ["failed > 0"]
+        params = []
+
+        if flaky_only:
+            conditions.append("flaky")
+
+        prefix = normalize_prefix(prefix)
+        if prefix:
+            conditions.append("nodeid >= ? AND nodeid < ?")
+            params += [prefix, next_key(prefix)]
+            if self.is_node(prefix):
+                # Skip siblings sharing the prefix, e.g. CaseTwo for Case
+                conditions.append(
+                    "(nodeid = ? OR substr(nodeid, ?, 1) = '/' "
+                    "OR substr(nodeid, ?, 2) = '::')"
+                )
+                params += [prefix, len(prefix) + 1, len(prefix) + 1]
+
+        if owner is not None:
+            conditions.append("owner = ?")
+            params.append(owner)
+
+        params.append(top or -1)
+        return self.connection.execute(
+            "SELECT nodeid, faillineno, ok, failed, flaky, owner FROM tests "
+            f"WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {SORT_KEYS[sort]} DESC, rowid LIMIT ?",
+            params,
+        ).fetchall()
+
+    def rollup(self, prefix=""):
+        """Return ``(name, tests, ok, failed, flaky)`` rows for the directories,
+        modules, classes and tests right below a prefix, or matching its partial
+        last segment.
+        """
+        prefix = normalize_prefix(prefix)
+        if not prefix or self.is_node(prefix):
+            parent, name_lo, name_hi = prefix, "", None
+        else:
+            separator = "::" if "::" in prefix else "/"
+            parent, _, name = prefix.rpartition(separator)
+            name_lo, name_hi = name, next_key(name)
+
+        rows = self.connection.execute(
+            "SELECT name, tests, ok, failed, flaky FROM nodes "
+            "WHERE parent = ? AND name >= ? AND (? IS NULL OR name < ?)",
+            (parent, name_lo, name_hi, name_hi),
+        ).fetchall()
+
+        # Tests are the children of modules and classes, not stored as nodes
+        lo = f"{parent}::{name_lo}"
+        hi = f"{parent}::{name_hi}" if name_hi else f"{parent}:;"
+        rows += self.connection.execute(
+            "SELECT substr(nodeid, ?) AS name, count(*), sum(ok), sum(failed), "
+            "sum(flaky) FROM tests WHERE nodeid >= ? AND nodeid < ? "
+            "AND instr(substr(nodeid, ?), '::') = 0 GROUP BY nodeid",
+            (len(parent) + 3, lo, hi, len(parent) + 3),
+        ).fetchall()
+        return rows
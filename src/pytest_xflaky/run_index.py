@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+
+INDEX_FILENAME = ".xflaky_index"
+
+
+def run_fingerprint(run_id):
+    return f"run:{run_id}"
+
+
+def fingerprint_file(path):
+    """Return the fingerprint of the run id recorded in a json report.
+
+    Runs collected before run ids were recorded are fingerprinted by content.
+    """
+    with open(path, "rb") as fp:
+        content = fp.read()
+
+    try:
+        run_id = json.loads(content)["xflaky"]["run_id"]
+    except (ValueError, KeyError, TypeError):
+        run_id = None
+    if run_id:
+        return run_fingerprint(run_id)
+    return hashlib.sha256(content).hexdigest()
+
+
+class RunIndex:
+    """Persistent filename -> run fingerprint index of a reports directory.
+
+    Entries are keyed by filename and validated against size and mtime, so an
+    unchanged file is never read twice. Copies of the same run under different
+    names or with different content, like the local copy of a run and the one
+    assembled by a collector, share a fingerprint and can be skipped without
+    being parsed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILENAME)
+        self.files = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as fp:
+                self.files = json.load(fp)["files"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self.files = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump({"files": self.files}, fp)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def fingerprint(self, filename, *, run_id=None):
+        """Return the fingerprint of a file, ``run_id`` saving its parsing."""
+        stat = os.stat(os.path.join(self.directory, filename))
+        entry = self.files.get(filename)
+        if (
+            entry
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return entry["fingerprint"]
+
+        if run_id:
+            fingerprint = run_fingerprint(run_id)
+        else:
+            fingerprint = fingerprint_file(os.path.join(self.directory, filename))
+        self.files[filename] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "fingerprint": fingerprint,
+        }
+        self.dirty = True
+        return fingerprint
+
+    def prune(self, filenames):
+        for filename in set(self.files) - set(filenames):
+            del self.files[filename]
+            self.dirty = True
+
+    def iter_unique(self, filenames):
+        """Yield filenames whose run has not been seen earlier in the list."""
+        seen = set()
+        for filename in filenames:
+            fingerprint = self.fingerprint(filename)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            yield filename
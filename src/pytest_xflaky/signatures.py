@@ -0,0 +1,113 @@
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+
+STAGES = ("setup", "call", "teardown")
+SITE_PACKAGES_RE = re.compile(r"^.*[/\\](?:site|dist)-packages[/\\]")
+EXCEPTION_RE = re.compile(r"^([\w.]+)(?::|$)")
+
+
+def normalize_path(path, root=None):
+    path = SITE_PACKAGES_RE.sub("", path)
+    if root and os.path.isabs(path) and path.startswith(root.rstrip("/") + "/"):
+        path = os.path.relpath(path, root)
+    return path.replace("\\", "/")
+
+
+def get_exception_type(stage):
+    """Return the exception type of a failed stage of a json report test."""
+    try:
+        message = stage["crash"]["message"]
+    except (KeyError, TypeError):
+        message = ""
+
+    if match := EXCEPTION_RE.match(message.split("\n", 1)[0]):
+        return match.group(1)
+
+    # Assertion rewriting and some plugins don't start the message with the type
+    traceback = stage.get("traceback") or []
+    if traceback and traceback[-1].get("message"):
+        return traceback[-1]["message"].split(":", 1)[0]
+
+    return "unknown"
+
+
+def failure_signature(test, root=None):
+    """Return the signature of a failed json report test, or None if it passed.
+
+    The signature is a hash of the failing stage, the exception type and the
+    normalized ``path:lineno`` of every traceback frame, so the same failure has
+    the same signature across tests and machines.
+    """
+    for name in STAGES:
+        stage = test.get(name)
+        if stage and stage.get("outcome") == "failed":
+            break
+    else:
+        return None
+
+    exception = get_exception_type(stage)
+    frames = [
+        f"{normalize_path(frame['path'], root)}:{frame['lineno']}"
+        for frame in stage.get("traceback") or []
+    ]
+    if not frames and stage.get("crash"):
+        crash = stage["crash"]
+        frames = [f"{normalize_path(crash['path'], root)}:{crash['lineno']}"]
+
+    digest = hashlib.sha1("\n".join([name, exception, *frames]).encode("utf-8"))
+    return {
+        "id": digest.hexdigest()[:12],
+        "stage": name,
+        "exception": exception,
+        "location": frames[-1] if frames else "",
+    }
+
+
+@dataclass
+class FailureCluster:
+    signature: dict
+    tests: list = field(default_factory=list)
+    failures: int = 0
+
+    def __str__(self):
+        signature = self.signature
+        location = f" at {signature['location']}" if signature["location"] else ""
+        return (
+            f"{signature['id']} {signature['exception']} in {signature['stage']}"
+            f"{location} (tests: {len(self.tests)}, failures: {self.failures})"
+        )
+
+
+class FailureClusters:
+    """Group the failures of flaky tests by signature, one test at a time.
+
+    ``signatures`` maps signature ids to the signature details collected by
+    `FlakyTestFinder`.
+    """
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+        self.by_id = {}
+
+    def add(self, maybe_flaky_test):
+        if not maybe_flaky_test.is_flaky():
+            return
+
+        for signature_id, failures in maybe_flaky_test.signatures.items():
+            cluster = self.by_id.get(signature_id)
+            if cluster is None:
+                cluster = self.by_id[signature_id] = FailureCluster(
+                    signature=self.signatures[signature_id]
+                )
+            cluster.tests.append(maybe_flaky_test)
+            cluster.failures += failures
+
+    def sorted(self):
+        """Return clusters sorted by number of tests, largest first."""
+        return sorted(
+            self.by_id.values(),
+            key=lambda cluster: (len(cluster.tests), cluster.failures),
+            reverse=True,
+        )
@@ -4,3 +4,18 @@ import sys
 pytest_plugins = "pytester"
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from pytest_xflaky.plugin import MaybeFlakyTest
+from pytest_xflaky.plugin import Test as XflakyTest
+
+
+def make_test(nodeid, ok, failed, *, faillineno=1, signatures=None):
+    """Return a `MaybeFlakyTest` flaky after one failure and one success."""
+    return MaybeFlakyTest(
+        test=XflakyTest(nodeid=nodeid, faillineno=faillineno, testlineno=1),
+        ok=ok,
+        failed=failed,
+        min_failures=1,
+        min_successes=1,
+        signatures=signatures or {},
+    )
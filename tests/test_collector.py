@@ -0,0 +1,229 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from pytest_xflaky.collector import (
+    TOKEN_HEADER,
+    CollectorClient,
+    CollectorStore,
+    PostResult,
+    make_batch,
+    make_server,
+)
+from pytest_xflaky.plugin import FlakyTestFinder
+
+REPORT = {
+    "created": 1.0,
+    "root": "/root/project",
+    "xflaky": {"run_id": "run-1", "seed": None},
+    "tests": [
+        {"nodeid": "a.py::test_a", "lineno": 1, "outcome": "passed"},
+        {"nodeid": "a.py::test_b", "lineno": 2, "outcome": "failed"},
+        {"nodeid": "a.py::test_c", "lineno": 3, "outcome": "passed"},
+    ],
+}
+
+
+@pytest.fixture
+def store_directory(tmp_path):
+    directory = tmp_path / "store"
+    directory.mkdir()
+    return str(directory)
+
+
+@pytest.fixture
+def spool_directory(tmp_path):
+    return str(tmp_path / "spool")
+
+
+@pytest.fixture
+def start_collector(store_directory):
+    servers = []
+
+    def start_collector(**kwargs):
+        server = make_server("127.0.0.1", 0, store_directory, **kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start_collector
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def collector(start_collector):
+    return start_collector()
+
+
+def test_make_batch():
+    batch = make_batch("run", 0, REPORT["tests"][:2])
+    assert "total" not in batch
+
+    batch = make_batch("run", 1, REPORT["tests"][2:], REPORT)
+    assert batch["total"] == 2
+    assert batch["report"] == {
+        "created": 1.0,
+        "root": "/root/project",
+        "xflaky": {"run_id": "run-1", "seed": None},
+    }
+
+
+def test_send_to_collector(collector, store_directory, spool_directory):
+    client = CollectorClient(collector, spool_directory, batch_size=2)
+    client.send("run-1", REPORT)
+    client.close()
+
+    assert client.sent == 2
+    assert client.spooled == 0
+
+    with open(os.path.join(store_directory, "run-1-report.json")) as fp:
+        assert json.load(fp) == REPORT
+
+    finder = FlakyTestFinder(directory=store_directory, min_failures=1, min_successes=1)
+    assert sorted((test.test.nodeid, test.failed) for test in finder.iter_tests()) == [
+        ("a.py::test_a", 0),
+        ("a.py::test_b", 1),
+        ("a.py::test_c", 0),
+    ]
+
+
+def test_local_copy_and_collected_run_count_once(
+    collector, store_directory, spool_directory
+):
+    # Collecting with the collector writing to the local reports directory
+    with open(os.path.join(store_directory, "run-1-.report.json"), "w") as fp:
+        json.dump({**REPORT, "environment": {"Python": "3.12"}}, fp)
+    client = CollectorClient(collector, spool_directory, batch_size=2)
+    client.send("run-1", REPORT)
+    client.close()
+
+    finder = FlakyTestFinder(directory=store_directory, min_failures=1, min_successes=1)
+    assert sorted((test.test.nodeid, test.failed) for test in finder.iter_tests()) == [
+        ("a.py::test_a", 0),
+        ("a.py::test_b", 1),
+        ("a.py::test_c", 0),
+    ]
+    assert finder.duplicates == 1
+
+
+def test_spool_when_collector_is_unreachable(
+    start_collector, store_directory, spool_directory
+):
+    client = CollectorClient(
+        "http://127.0.0.1:1", spool_directory, batch_size=2, retries=1
+    )
+    client.send("run-1", REPORT)
+    assert client.spooled == 2
+    assert len(os.listdir(spool_directory)) == 2
+
+    client = CollectorClient(start_collector(), spool_directory)
+    assert client.flush_spool()
+    assert os.listdir(spool_directory) == []
+
+    with open(os.path.join(store_directory, "run-1-report.json")) as fp:
+        assert json.load(fp) == REPORT
+
+
+def test_unreachable_collector_is_not_retried(spool_directory, monkeypatch):
+    client = CollectorClient("http://127.0.0.1:1", spool_directory, batch_size=2)
+    attempts = []
+
+    def post(*args, **kwargs):
+        attempts.append(kwargs["timeout"])
+        raise requests.ConnectionError
+
+    monkeypatch.setattr(client.session, "post", post)
+    client.send("run-1", REPORT)
+
+    # Only the first batch tried to connect, with the short connect timeout
+    assert attempts == [(2, 10)]
+    assert client.spooled == 2
+
+
+def test_invalid_batch_is_rejected(collector, spool_directory):
+    client = CollectorClient(collector, spool_directory)
+    assert client.post(b"not gzip") is PostResult.REJECTED
+
+
+def test_rejected_batch_is_not_sent(collector, store_directory, spool_directory):
+    client = CollectorClient(collector, spool_directory, batch_size=2)
+    # A run id the collector refuses
+    client.send("run/1", REPORT)
+
+    assert client.sent == 0
+    assert client.rejected == 2
+    assert client.incomplete_runs == {"run/1"}
+
+
+def test_batch_too_large_is_split(start_collector, store_directory, spool_directory):
+    batch = json.dumps(make_batch("run-1", 0, REPORT["tests"])).encode()
+    # Too small for the batch of every test
+    url = start_collector(max_decompressed_size=len(batch) - 1)
+
+    client = CollectorClient(url, spool_directory, batch_size=3)
+    client.send("run-1", REPORT)
+
+    assert (client.sent, client.rejected) == (3, 0)
+    with open(os.path.join(store_directory, "run-1-report.json")) as fp:
+        assert json.load(fp) == REPORT
+
+
+def test_incomplete_runs_expire(store_directory):
+    store = CollectorStore(store_directory, incomplete_run_timeout=60)
+    store.add(make_batch("run-1", 0, REPORT["tests"][:2]))
+    run_directory = os.path.join(store_directory, ".parts", "run-1")
+    assert os.path.isdir(run_directory)
+
+    an_hour_ago = time.time() - 3600
+    os.utime(run_directory, (an_hour_ago, an_hour_ago))
+    store.expired_at = 0.0
+    store.add(make_batch("run-2", 0, REPORT["tests"][:2]))
+
+    assert os.listdir(os.path.join(store_directory, ".parts")) == ["run-2"]
+
+
+def test_retried_batch_after_assembly_is_skipped(
+    collector, store_directory, spool_directory
+):
+    client = CollectorClient(collector, spool_directory, batch_size=2)
+    client.send("run-1", REPORT)
+    # A batch retried after the run was assembled, e.g. after a client timeout
+    batch = make_batch("run-1", 0, REPORT["tests"][:2])
+
+    assert client.post(gzip.compress(json.dumps(batch).encode())) is PostResult.SENT
+    assert os.listdir(os.path.join(store_directory, ".parts")) == []
+
+
+def test_token_is_required(start_collector, store_directory, spool_directory):
+    url = start_collector(token="secret")
+
+    client = CollectorClient(url, spool_directory, batch_size=2, retries=1)
+    client.send("run-1", REPORT)
+    assert client.spooled == 2
+    assert not os.path.exists(os.path.join(store_directory, "run-1-report.json"))
+
+    client = CollectorClient(url, spool_directory, token="secret")
+    assert client.flush_spool()
+    assert os.path.exists(os.path.join(store_directory, "run-1-report.json"))
+
+
+def test_oversized_bodies_are_rejected(start_collector):
+    url = start_collector(max_body_size=1000, max_decompressed_size=1000)
+    headers = {"Content-Encoding": "gzip", TOKEN_HEADER: ""}
+
+    response = requests.post(f"{url}/batches", data=b"x" * 2000, headers=headers)
+    assert response.status_code == 413
+
+    # Compresses to a few bytes, but decompresses over the limit
+    bomb = gzip.compress(b" " * 100_000)
+    assert len(bomb) < 1000
+    response = requests.post(f"{url}/batches", data=bomb, headers=headers)
+    assert response.status_code == 413
@@ -0,0 +1,112 @@
+import json
+
+from pytest_xflaky import github_blame
+from pytest_xflaky.github_blame import GithubBlame
+from pytest_xflaky.github_users import (
+    Codeowners,
+    GithubUserResolver,
+    parse_mailmap,
+    parse_users_file,
+)
+
+
+def api_lookup(email):
+    return {"someone@example.com": "someone"}.get(email)
+
+
+def test_noreply_email():
+    resolver = GithubUserResolver(api_lookup)
+
+    assert resolver.resolve("12345+octocat@users.noreply.github.com") == "octocat"
+    assert resolver.resolve("octocat@users.noreply.github.com") == "octocat"
+    assert resolver.stats == {"noreply": 2}
+
+
+def test_users_file_and_cache(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps({"Jane@Example.com": "jane"}))
+
+    resolver = GithubUserResolver(api_lookup, users=parse_users_file(str(path)))
+
+    assert resolver.resolve("jane@example.com") == "jane"
+    assert resolver.resolve("jane@example.com") == "jane"
+    assert resolver.stats == {"users_file": 1, "cache": 1}
+
+
+def test_mailmap(tmp_path):
+    path = tmp_path / ".mailmap"
+    path.write_text(
+        "# comment\n"
+        "Jane <1+jane@users.noreply.github.com> <jane@laptop.local>\n"
+        "Only Name <name@example.com>\n"
+    )
+
+    mailmap = parse_mailmap(str(path))
+
+    assert mailmap == {"jane@laptop.local": "1+jane@users.noreply.github.com"}
+    assert parse_mailmap(str(tmp_path / "missing")) == {}
+
+    resolver = GithubUserResolver(api_lookup, mailmap=mailmap)
+    assert resolver.resolve("jane@laptop.local") == "jane"
+    assert resolver.stats == {"mailmap:noreply": 1}
+
+
+def test_api_is_last_resort():
+    resolver = GithubUserResolver(api_lookup)
+
+    assert resolver.resolve("someone@example.com") == "someone"
+    assert resolver.resolve("nobody@example.com") is None
+    assert resolver.resolve("nobody@example.com") is None
+    assert resolver.stats == {"api": 2, "cache": 1}
+    assert resolver.format_stats().endswith("API calls avoided: 1")
+
+
+def test_codeowners():
+    codeowners = Codeowners(
+        [
+            ("*", ["@everyone"]),
+            ("*.py", ["@python"]),
+            ("/tests/billing/", ["@billing", "@org/payments"]),
+            ("docs/*", ["@docs"]),
+            ("**/cache", ["@cache"]),
+        ]
+    )
+
+    assert codeowners.owners("setup.cfg") == ["@everyone"]
+    assert codeowners.owners("tests/test_a.py") == ["@python"]
+    assert codeowners.owners("./tests/billing/test_a.py") == [
+        "@billing",
+        "@org/payments",
+    ]
+    assert codeowners.owners("docs/index.rst") == ["@docs"]
+    assert codeowners.owners("docs/api/index.rst") == ["@everyone"]
+    assert codeowners.owners("src/app/cache/test_x.py") == ["@cache"]
+
+
+def test_codeowners_user_skips_teams_and_emails():
+    codeowners = Codeowners(
+        [
+            ("/src/", ["@Tesorio/backend", "dev@example.com", "@alice"]),
+            ("/docs/", ["@Tesorio/docs"]),
+        ]
+    )
+
+    assert codeowners.user("src/app.py") == "alice"
+    assert codeowners.user("docs/index.rst") is None
+    assert codeowners.user("setup.cfg") is None
+
+
+def test_blame_without_author_falls_back_to_codeowners(tmp_path, monkeypatch):
+    (tmp_path / "CODEOWNERS").write_text("/tests/ @Tesorio/qa @alice\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(github_blame, "get_blame_output", lambda file, lineno: "")
+
+    blame = GithubBlame(None)
+
+    assert blame.blame("tests/test_a.py", 3) == {
+        "email": None,
+        "commit": None,
+        "github_username": "alice",
+    }
+    assert blame.blame("src/app.py", 3) is None
+    assert blame.resolver.stats == {"codeowners": 1}
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from pytest_xflaky.host_sampler import Contention, HostSampler, is_contended
+
+
+def make_sample(load_per_cpu, steal=None):
+    return {
+        "load_per_cpu": load_per_cpu,
+        "steal": steal,
+        "memory_pressure": None,
+        "rss": 100,
+    }
+
+
+def test_window():
+    sampler = HostSampler(1.0)
+    sampler.timestamps = [1.0, 2.0, 3.0, 4.0]
+    sampler.samples = [
+        make_sample(0.1),
+        make_sample(0.5, steal=20.0),
+        make_sample(0.3),
+        make_sample(2.0),
+    ]
+
+    assert sampler.window(2.5, 3.5) == {
+        "load_per_cpu": 0.5,
+        "steal": 20.0,
+        "memory_pressure": None,
+        "rss": 100,
+    }
+    assert sampler.window(0.0, 0.5) is None
+    assert sampler.window(5.0, 6.0)["load_per_cpu"] == 2.0
+    assert HostSampler(1.0).window(0.0, 1.0) is None
+
+
+def test_contention():
+    assert not is_contended(make_sample(0.5))
+    assert is_contended(make_sample(1.5))
+    assert is_contended(make_sample(0.5, steal=15.0))
+
+    contention = Contention()
+    contention.add(make_sample(1.5), failure=True)
+    contention.add(make_sample(0.5), failure=True)
+    contention.add(make_sample(0.5), failure=False)
+    assert str(contention) == "contended: failures 1/2, successes 0/1"
+
+
+def test_interval_backs_off_and_recovers():
+    sampler = HostSampler(0.5, max_overhead=0.01)
+
+    # 20ms spent sampling in 1s, waiting 1.99s brings the next sample to 1%
+    sampler.cost = 0.02
+    sampler.max_sample_cost = 0.01
+    sampler.adjust_interval(1.0)
+    assert sampler.interval == pytest.approx(1.99)
+
+    # Well under the cap, the interval returns to the configured one
+    sampler.adjust_interval(10.0)
+    assert sampler.interval == 0.5
+
+
+def test_overhead_is_capped():
+    # A 0.1ms interval would spend most of the time sampling
+    sampler = HostSampler(0.0001, max_overhead=0.01)
+    sampler.start()
+    time.sleep(0.3)
+    sampler.stop()
+
+    assert len(sampler.samples) > 1
+    assert sampler.interval > 0.0001
+    # A sample costing more than every previous one can overshoot slightly
+    assert sampler.overhead() < 0.0125
+
+
+def test_sample():
+    sampler = HostSampler(1.0)
+    sample = sampler.sample()
+
+    assert sample["load_per_cpu"] >= 0
+    assert set(sample) == {"load_per_cpu", "steal", "memory_pressure", "rss"}
+
+
+def test_sample_without_load_average(monkeypatch):
+    monkeypatch.delattr("os.getloadavg")
+
+    assert HostSampler(1.0).sample()["load_per_cpu"] is None
@@ -0,0 +1,60 @@
+from pytest_xflaky.orchestrator import (
+    CollectRun,
+    RunOrchestrator,
+    seed_plan,
+    strip_args,
+)
+
+
+def test_seed_plan():
+    assert seed_plan(1) == [None]
+    assert seed_plan(5) == [None, 1, 2, 3, 4]
+    assert seed_plan(3, shuffle=False) == [None, None, None]
+
+
+def test_strip_args():
+    assert strip_args(
+        ["tests", "--xflaky-runs", "5", "-x", "--randomly-seed=last", "-k", "foo"]
+    ) == ["tests", "-x", "-k", "foo"]
+    assert strip_args(["--xflaky-runs=5", "--xflaky-batch-id", "abc"]) == []
+
+
+def make_orchestrator(has_randomly):
+    return RunOrchestrator(
+        ["tests", "--xflaky-runs", "3"],
+        rootdir="/project",
+        reports_directory="/project/.reports",
+        batch_id="batch",
+        has_randomly=has_randomly,
+        workers=2,
+    )
+
+
+def test_build_command():
+    orchestrator = make_orchestrator(has_randomly=True)
+
+    ordered = orchestrator.build_command(CollectRun(0, None, "/tmp/0"))
+    assert ordered[3] == "tests"
+    assert "--xflaky-runs" not in ordered
+    assert "--xflaky-collect" in ordered
+    assert "--json-report-file=/tmp/0/report.json" in ordered
+    assert "--xflaky-reports-directory=/project/.reports" in ordered
+    assert "--xflaky-batch-id=batch" in ordered
+    assert "--basetemp=/tmp/0/basetemp" in ordered
+    assert "cache_dir=/tmp/0/cache" in ordered
+    assert ordered[-2:] == ["-p", "no:randomly"]
+
+    shuffled = orchestrator.build_command(CollectRun(1, 1, "/tmp/1"))
+    assert shuffled[-3:] == ["-p", "randomly", "--randomly-seed=1"]
+
+
+def test_plan_without_randomly():
+    orchestrator = make_orchestrator(has_randomly=False)
+
+    plan = orchestrator.plan(3, "/tmp")
+    assert [str(run) for run in plan] == [
+        "Run 0 (ordered): exit code None",
+        "Run 1 (ordered): exit code None",
+        "Run 2 (ordered): exit code None",
+    ]
+    assert orchestrator.build_command(plan[1])[-2:] == ["-p", "no:randomly"]
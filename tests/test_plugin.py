@@ -0,0 +1,193 @@
+import json
+import re
+
+from pytest_xflaky.polluters import get_run_order
+
+COLLECT_ARGS = ["--xflaky-collect", "--json-report", "-p", "no:randomly"]
+
+POLLUTED_TESTS = """
+import os
+
+def test_clean():
+    pass
+
+def test_polluter():
+    os.environ["XFLAKY_POLLUTED"] = "1"
+
+def test_other():
+    pass
+
+def test_target():
+    assert "XFLAKY_POLLUTED" not in os.environ
+"""
+
+
+def load_collected_runs(pytester):
+    runs = []
+    for path in sorted((pytester.path / ".reports").glob("*.json")):
+        runs.append(json.loads(path.read_text()))
+    return runs
+
+
+def test_collect_records_order_and_seed(pytester):
+    # Run tests in reverse order, each one logging that it was executed
+    pytester.makeconftest("""
+        import pytest
+
+        def pytest_collection_modifyitems(items):
+            items.reverse()
+
+        @pytest.fixture(autouse=True)
+        def log_execution(request):
+            with open("executed.txt", "a") as fp:
+                fp.write(f"{request.node.nodeid}\\n")
+        """)
+    pytester.makepyfile(test_polluted=POLLUTED_TESTS)
+
+    result = pytester.runpytest_subprocess(*COLLECT_ARGS)
+    result.assert_outcomes(passed=4)
+
+    [run] = load_collected_runs(pytester)
+    [path] = (pytester.path / ".reports").glob("*.json")
+    assert path.name.startswith(f"{run['xflaky']['run_id']}-")
+    assert run["xflaky"]["seed"] is None
+    executed = (pytester.path / "executed.txt").read_text().splitlines()
+    assert executed[0] == "test_polluted.py::test_target"
+    assert get_run_order(run) == executed
+
+
+def test_collect_stores_failure_signatures(pytester):
+    pytester.makepyfile(test_signatures="""
+        import pytest
+
+        @pytest.fixture
+        def slow_service():
+            raise TimeoutError("service did not answer")
+
+        def test_a(slow_service):
+            pass
+
+        def test_b(slow_service):
+            pass
+
+        def test_c():
+            assert False
+        """)
+
+    pytester.runpytest_subprocess(*COLLECT_ARGS)
+
+    [run] = load_collected_runs(pytester)
+    signatures = {test["nodeid"]: test.get("xflaky_signature") for test in run["tests"]}
+    assert signatures["test_signatures.py::test_a"]["id"] == (
+        signatures["test_signatures.py::test_b"]["id"]
+    )
+    assert signatures["test_signatures.py::test_a"]["stage"] == "setup"
+    assert signatures["test_signatures.py::test_a"]["exception"] == "TimeoutError"
+    assert signatures["test_signatures.py::test_c"]["exception"] == "AssertionError"
+
+
+def test_collect_records_host_state_per_test(pytester):
+    pytester.makepyfile(test_slow="""
+        import time
+
+        def test_a():
+            time.sleep(0.05)
+
+        def test_b():
+            time.sleep(0.05)
+        """)
+
+    result = pytester.runpytest_subprocess(
+        *COLLECT_ARGS,
+        "--xflaky-host-sampling",
+        "--xflaky-host-sampling-interval",
+        "0.01",
+    )
+
+    result.stdout.fnmatch_lines(["Host sampler: * samples, *ms (*% of wall time)"])
+    [run] = load_collected_runs(pytester)
+    for test in run["tests"]:
+        assert set(test["xflaky_host"]) == {
+            "load_per_cpu",
+            "steal",
+            "memory_pressure",
+            "rss",
+        }
+
+
+def test_bisect_finds_polluter(pytester):
+    pytester.makepyfile(test_polluted=POLLUTED_TESTS)
+    pytester.runpytest_subprocess(*COLLECT_ARGS)
+
+    result = pytester.runpytest_subprocess(
+        "--xflaky-bisect",
+        "test_polluted.py::test_target",
+        "--xflaky-bisect-workers",
+        "2",
+    )
+
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(
+        [
+            "Bisecting 3 tests executed before test_polluted.py::test_target",
+            "POLLUTERS (* batches of 2 runs):",
+            "test_polluted.py::test_polluter",
+        ]
+    )
+
+
+def test_bisect_without_failing_run(pytester):
+    pytester.makepyfile(test_polluted=POLLUTED_TESTS)
+    pytester.runpytest_subprocess(*COLLECT_ARGS)
+
+    result = pytester.runpytest_subprocess(
+        "--xflaky-bisect", "test_polluted.py::test_clean"
+    )
+
+    assert result.ret == 1
+    result.stderr.fnmatch_lines(
+        ["*No collected run where test_polluted.py::test_clean failed*"]
+    )
+
+
+def test_runs_collects_a_batch_and_reports_it(pytester):
+    pytester.makepyfile(test_flaky="""
+        import os
+
+        import pytest
+
+        @pytest.fixture
+        def first_run_fails():
+            # Fails in the first run only, even when runs are concurrent
+            marker = os.path.join(os.path.dirname(__file__), "marker")
+            try:
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+            except FileExistsError:
+                return
+            raise RuntimeError("first run")
+
+        def test_stable():
+            pass
+
+        def test_flaky(first_run_fails):
+            pass
+        """)
+
+    result = pytester.runpytest_subprocess("--xflaky-runs", "2", "-p", "no:randomly")
+
+    assert result.ret == 1
+    result.stdout.fnmatch_lines(
+        [
+            "Running 2 collect runs in batch *",
+            "Run 0 (ordered): exit code *",
+            "Run 1 (ordered): exit code *",
+            "test_flaky.py::test_flaky:* (failed: 1/2) FLAKY",
+        ]
+    )
+    batch_id = re.search(r"in batch (\w+)", result.stdout.str()).group(1)
+    runs = list((pytester.path / ".reports").glob("*.json"))
+    assert len(runs) == 2
+    assert all(path.name.startswith(f"{batch_id}-") for path in runs)
+    assert all(
+        json.loads(path.read_text())["xflaky"]["batch_id"] == batch_id for path in runs
+    )
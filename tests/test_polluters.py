@@ -0,0 +1,34 @@
+from pytest_xflaky.polluters import PolluterFinder
+
+
+def make_reproduces(polluters):
+    def reproduces(tests):
+        return polluters <= set(tests)
+
+    return reproduces
+
+
+def test_single_polluter():
+    candidates = [f"test_{i}" for i in range(5000)]
+    finder = PolluterFinder(make_reproduces({"test_4321"}), workers=8)
+
+    assert finder.run(candidates) == ["test_4321"]
+    # Waves of 8 concurrent runs: 5000 -> 625 -> 79 -> 10 -> 2 -> 1 candidates
+    assert finder.batches <= 5
+
+
+def test_multiple_polluters():
+    candidates = [f"test_{i}" for i in range(500)]
+    finder = PolluterFinder(make_reproduces({"test_7", "test_420"}), workers=4)
+
+    assert finder.run(candidates) == ["test_7", "test_420"]
+
+
+def test_not_reproducible():
+    candidates = [f"test_{i}" for i in range(10)]
+
+    finder = PolluterFinder(make_reproduces({"test_missing"}), workers=4)
+    assert finder.run(candidates) is None
+
+    finder = PolluterFinder(make_reproduces(set()), workers=4)
+    assert finder.run(candidates) is None
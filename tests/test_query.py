@@ -0,0 +1,142 @@
+import pytest
+from conftest import make_test
+
+from pytest_xflaky.cli import main
+from pytest_xflaky.query import QueryIndex, build_index
+
+TESTS = [
+    make_test("tests/billing/test_invoice.py::InvoiceTest::test_total", 3, 1),
+    make_test("tests/billing/test_invoice.py::InvoiceTest::test_tax", 2, 2),
+    make_test("tests/billing/test_payment.py::test_refund", 0, 4),
+    make_test("tests/cache/test_get.py::test_get", 4, 0),
+    make_test("tests/cache/test_get.py::test_set", 1, 3),
+]
+
+
+@pytest.fixture
+def open_index(tmp_path):
+    indexes = []
+
+    def open_index(tests, owners=None):
+        path = str(tmp_path / "index.db")
+        build_index(path, tests, owners=owners)
+        indexes.append(QueryIndex(path))
+        return indexes[-1]
+
+    yield open_index
+    for index in indexes:
+        index.close()
+
+
+def nodeids(entries):
+    return [entry[0] for entry in entries]
+
+
+def test_prefix_filter(open_index):
+    index = open_index(TESTS)
+
+    assert nodeids(index.query("tests/billing/", sort="failures")) == [
+        "tests/billing/test_payment.py::test_refund",
+        "tests/billing/test_invoice.py::InvoiceTest::test_tax",
+        "tests/billing/test_invoice.py::InvoiceTest::test_total",
+    ]
+    assert nodeids(index.query("tests/billing/test_invoice.py::InvoiceTest")) == [
+        "tests/billing/test_invoice.py::InvoiceTest::test_tax",
+        "tests/billing/test_invoice.py::InvoiceTest::test_total",
+    ]
+    assert index.query("tests/bill") == index.query("tests/billing")
+    assert index.query("tests/nothing/") == []
+
+
+def test_exact_segment_does_not_match_siblings(open_index):
+    index = open_index(
+        [
+            make_test("tests/a.py::Case::test_x", 1, 1),
+            make_test("tests/a.py::CaseTwo::test_x", 1, 1),
+        ]
+    )
+
+    assert nodeids(index.query("tests/a.py::Case")) == ["tests/a.py::Case::test_x"]
+    assert len(index.query("tests/a.py::Ca")) == 2
+
+
+def test_top_k_and_flaky_only(open_index):
+    index = open_index(TESTS)
+
+    assert nodeids(index.query(top=2)) == [
+        "tests/billing/test_payment.py::test_refund",
+        "tests/cache/test_get.py::test_set",
+    ]
+    assert nodeids(index.query(flaky_only=True, sort="score", top=1)) == [
+        "tests/billing/test_invoice.py::InvoiceTest::test_tax",
+    ]
+
+
+def test_owner_view(open_index):
+    owners = {("tests/cache/test_get.py::test_set", 1): "octocat"}
+    index = open_index(TESTS, owners=owners)
+
+    assert nodeids(index.query(owner="octocat")) == [
+        "tests/cache/test_get.py::test_set"
+    ]
+    assert index.query("tests/billing/", owner="octocat") == []
+
+
+def test_rollup(open_index):
+    index = open_index(TESTS)
+
+    counts = {
+        name: (tests, failed, flaky)
+        for name, tests, ok, failed, flaky in index.rollup("tests/")
+    }
+    assert counts == {"billing": (3, 7, 2), "cache": (2, 3, 1)}
+
+    counts = {
+        name: (tests, failed, flaky)
+        for name, tests, ok, failed, flaky in index.rollup("tests/cache/test_get.py")
+    }
+    assert counts == {"test_get": (1, 0, 0), "test_set": (1, 3, 1)}
+    assert [node[0] for node in index.rollup("tests/bill")] == ["billing"]
+
+
+def test_unsupported_version(tmp_path):
+    path = tmp_path / "index.db"
+    path.write_bytes(b"")
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        QueryIndex(str(path))
+
+
+def test_query_without_index(tmp_path, capsys):
+    assert main(["query", "--index", str(tmp_path / "index.db")]) == 1
+    assert "run pytest --xflaky-report" in capsys.readouterr().err
+
+
+def test_queries_on_100k_tests(tmp_path):
+    path = str(tmp_path / "index.db")
+    build_index(
+        path,
+        (
+            make_test(
+                f"tests/app{i % 20}/test_mod{i % 500}.py::Case{i % 7}::test_{i}",
+                ok=i % 5,
+                failed=i % 3,
+            )
+            for i in range(100_000)
+        ),
+        owners={
+            (f"tests/app1/test_mod1.py::Case1::test_{i}", 1): "octocat"
+            for i in range(1, 100_000, 3500)
+        },
+    )
+
+    index = QueryIndex(path)
+    try:
+        assert len(index.query(top=20)) == 20
+        assert len(index.query(flaky_only=True, sort="score", top=20)) == 20
+        assert len(index.query("tests/app3/test_mod3.py", top=20)) == 20
+        assert len(index.query(owner="octocat")) > 0
+        assert len(index.rollup("tests/")) == 20
+        assert len(index.rollup("tests/app3/")) == 25
+    finally:
+        index.close()
@@ -0,0 +1,210 @@
+import json
+import xml.dom.minidom
+from types import SimpleNamespace
+
+import pytest
+from conftest import make_test
+
+from pytest_xflaky.add_decorator import parse_report_file
+from pytest_xflaky.plugin import (
+    QueryIndexReportWriter,
+    TextFileReportWriter,
+    write_reports,
+)
+from pytest_xflaky.query import QueryIndex
+
+SIGNATURES = {
+    "timeout": {
+        "id": "timeout",
+        "stage": "setup",
+        "exception": "TimeoutError",
+        "location": "tests/conftest.py:5",
+    },
+}
+
+
+TESTS = [
+    make_test("tests/a.py::test_ok", 3, 0),
+    make_test("tests/a.py::test_broken", 0, 3, signatures={"timeout": 3}),
+    make_test(
+        "tests/a.py::Case::test_flaky", 1, 2, faillineno=10, signatures={"timeout": 2}
+    ),
+    make_test("tests/b.py::test_flaky", 2, 1, faillineno=20, signatures={"timeout": 1}),
+]
+
+
+def make_config(directory, **options):
+    defaults = {
+        "xflaky_text_report_file": str(directory / "report.txt"),
+        "xflaky_console_top": 0,
+        "xflaky_github_report": False,
+        "xflaky_jsonl_report_file": None,
+        "xflaky_junit_report_file": None,
+        "xflaky_query_index_file": str(directory / "index.db"),
+    }
+    return SimpleNamespace(option=SimpleNamespace(**{**defaults, **options}))
+
+
+def test_summary(tmp_path, capsys):
+    summary = write_reports(make_config(tmp_path), iter(TESTS), SIGNATURES)
+
+    assert str(summary) == (
+        "Flaky tests result (tests: 4, runs: 12, successes: 6, failures: 6, flaky: 2)"
+    )
+    assert [len(cluster.tests) for cluster in summary.clusters.sorted()] == [2]
+
+
+def test_text_report(tmp_path, capsys):
+    config = make_config(tmp_path)
+    write_reports(config, iter(TESTS), SIGNATURES)
+
+    with open(config.option.xflaky_text_report_file) as fp:
+        lines = fp.read().splitlines()
+
+    assert lines[:4] == [
+        "FAILED TESTS:",
+        "tests/a.py::test_broken:1 (failed: 3/3)",
+        "tests/a.py::Case::test_flaky:10 (failed: 2/3) FLAKY",
+        "tests/b.py::test_flaky:20 (failed: 1/3) FLAKY",
+    ]
+    assert lines[-1].startswith("Flaky tests result")
+    assert list(parse_report_file(config.option.xflaky_text_report_file)) == [
+        ("tests/a.py", "Case::test_flaky"),
+        ("tests/b.py", "test_flaky"),
+    ]
+    assert capsys.readouterr().out.splitlines() == lines
+
+
+def test_console_top(tmp_path, capsys):
+    config = make_config(tmp_path, xflaky_console_top=1)
+    write_reports(config, iter(TESTS), SIGNATURES)
+
+    out = capsys.readouterr().out.splitlines()
+    assert out[:3] == [
+        "FAILED TESTS:",
+        "tests/a.py::Case::test_flaky:10 (failed: 2/3) FLAKY",
+        f"... and 2 more failed tests in {config.option.xflaky_text_report_file}",
+    ]
+
+    with open(config.option.xflaky_text_report_file) as fp:
+        assert len([line for line in fp if "(failed: " in line]) == 3
+
+
+def test_jsonl_report(tmp_path, capsys):
+    path = str(tmp_path / "report.jsonl")
+    write_reports(
+        make_config(tmp_path, xflaky_jsonl_report_file=path), iter(TESTS), SIGNATURES
+    )
+
+    with open(path) as fp:
+        records = [json.loads(line) for line in fp]
+
+    assert [record["nodeid"] for record in records] == [
+        test.test.nodeid for test in TESTS
+    ]
+    assert records[2]["is_flaky"]
+    assert records[2]["signatures"] == {"timeout": 2}
+
+
+def test_junit_report(tmp_path, capsys):
+    path = str(tmp_path / "report.xml")
+    write_reports(
+        make_config(tmp_path, xflaky_junit_report_file=path), iter(TESTS), SIGNATURES
+    )
+
+    document = xml.dom.minidom.parse(path)
+    testsuite = document.getElementsByTagName("testsuite")[0]
+    assert testsuite.getAttribute("tests") == "4"
+    assert testsuite.getAttribute("failures") == "2"
+
+    testcases = document.getElementsByTagName("testcase")
+    assert [
+        (testcase.getAttribute("classname"), testcase.getAttribute("name"))
+        for testcase in testcases
+    ] == [
+        ("tests.a", "test_ok"),
+        ("tests.a", "test_broken"),
+        ("tests.a.Case", "test_flaky"),
+        ("tests.b", "test_flaky"),
+    ]
+    failures = document.getElementsByTagName("failure")
+    assert [failure.getAttribute("message") for failure in failures] == [
+        "flaky: failed 2/3",
+        "flaky: failed 1/3",
+    ]
+
+
+def test_query_index(tmp_path, capsys):
+    config = make_config(tmp_path)
+    write_reports(config, iter(TESTS), SIGNATURES)
+
+    index = QueryIndex(config.option.xflaky_query_index_file)
+    try:
+        assert [entry[0] for entry in index.query("tests/a.py")] == [
+            "tests/a.py::test_broken",
+            "tests/a.py::Case::test_flaky",
+        ]
+    finally:
+        index.close()
+
+
+class OwnerReportWriter:
+    """Blames flaky tests like GitHubReportWriter, without the GitHub API."""
+
+    @classmethod
+    def enabled(cls, config):
+        return True
+
+    def __init__(self, config, summary):
+        self.summary = summary
+
+    def add(self, maybe_flaky_test):
+        if maybe_flaky_test.is_flaky():
+            test = maybe_flaky_test.test
+            self.summary.owners[(test.nodeid, test.faillineno)] = "octocat"
+
+    def finish(self, summary):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_query_index_owners_from_a_later_writer(tmp_path, capsys):
+    config = make_config(tmp_path)
+    write_reports(
+        config,
+        iter(TESTS),
+        SIGNATURES,
+        writer_classes=[QueryIndexReportWriter, OwnerReportWriter],
+    )
+
+    index = QueryIndex(config.option.xflaky_query_index_file)
+    try:
+        assert [entry[0] for entry in index.query(owner="octocat")] == [
+            "tests/a.py::Case::test_flaky",
+            "tests/b.py::test_flaky",
+        ]
+    finally:
+        index.close()
+
+
+def test_writers_are_closed_when_one_fails_to_start(tmp_path):
+    class BrokenReportWriter(OwnerReportWriter):
+        def __init__(self, config, summary):
+            raise OSError("read-only file system")
+
+    config = make_config(tmp_path)
+    with pytest.raises(OSError):
+        write_reports(
+            config,
+            iter(TESTS),
+            SIGNATURES,
+            writer_classes=[
+                TextFileReportWriter,
+                QueryIndexReportWriter,
+                BrokenReportWriter,
+            ],
+        )
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["report.txt"]
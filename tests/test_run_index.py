@@ -0,0 +1,87 @@
+import json
+
+from pytest_xflaky.plugin import FlakyTestFinder
+from pytest_xflaky.run_index import INDEX_FILENAME, RunIndex
+
+
+def test_duplicates_are_skipped(tmp_path):
+    (tmp_path / "a-report.json").write_text('{"tests": []}')
+    (tmp_path / "b-report.json").write_text('{"tests": []}')
+    (tmp_path / "c-report.json").write_text('{"tests": [{}]}')
+
+    run_index = RunIndex(str(tmp_path))
+    filenames = ["a-report.json", "b-report.json", "c-report.json"]
+    assert list(run_index.iter_unique(filenames)) == [
+        "a-report.json",
+        "c-report.json",
+    ]
+
+
+def test_same_run_id_is_skipped(tmp_path):
+    (tmp_path / "a-report.json").write_text(
+        '{"tests": [], "environment": {}, "xflaky": {"run_id": "run-1"}}'
+    )
+    (tmp_path / "b-report.json").write_text(
+        '{"tests": [], "xflaky": {"run_id": "run-1"}}'
+    )
+
+    run_index = RunIndex(str(tmp_path))
+    assert run_index.fingerprint("b-report.json", run_id="run-1") == (
+        run_index.fingerprint("a-report.json")
+    )
+    assert list(run_index.iter_unique(["a-report.json", "b-report.json"])) == [
+        "a-report.json"
+    ]
+
+
+def test_finder_counts_copied_run_once(tmp_path):
+    report = json.dumps(
+        {
+            "tests": [
+                {"nodeid": "a.py::test_a", "lineno": 1, "outcome": "passed"},
+                {"nodeid": "a.py::test_b", "lineno": 2, "outcome": "failed"},
+            ]
+        }
+    )
+    (tmp_path / "a-report.json").write_text(report)
+    # The same run, e.g. restored from a CI cache under another name
+    (tmp_path / "b-report.json").write_text(report)
+
+    finder = FlakyTestFinder(directory=str(tmp_path), min_failures=1, min_successes=1)
+    tests = {t.test.nodeid: (t.ok, t.failed) for t in finder.iter_tests()}
+
+    assert tests == {"a.py::test_a": (1, 0), "a.py::test_b": (0, 1)}
+    assert finder.duplicates == 1
+
+
+def test_index_is_persisted(tmp_path):
+    (tmp_path / "a-report.json").write_text('{"tests": []}')
+
+    run_index = RunIndex(str(tmp_path))
+    fingerprint = run_index.fingerprint("a-report.json")
+    run_index.save()
+
+    assert (tmp_path / INDEX_FILENAME).exists()
+    reloaded = RunIndex(str(tmp_path))
+    assert reloaded.files["a-report.json"]["fingerprint"] == fingerprint
+    assert reloaded.fingerprint("a-report.json") == fingerprint
+    assert not reloaded.dirty
+
+
+def test_changed_file_is_rehashed(tmp_path):
+    (tmp_path / "a-report.json").write_text('{"tests": []}')
+
+    run_index = RunIndex(str(tmp_path))
+    fingerprint = run_index.fingerprint("a-report.json")
+
+    (tmp_path / "a-report.json").write_text('{"tests": [{}, {}]}')
+    assert run_index.fingerprint("a-report.json") != fingerprint
+
+
+def test_prune_removes_missing_files(tmp_path):
+    (tmp_path / "a-report.json").write_text('{"tests": []}')
+
+    run_index = RunIndex(str(tmp_path))
+    run_index.fingerprint("a-report.json")
+    run_index.prune([])
+    assert run_index.files == {}
@@ -0,0 +1,94 @@
+from conftest import make_test
+
+from pytest_xflaky.signatures import FailureClusters, failure_signature
+
+
+def make_report_test(nodeid, stage="call", message="AssertionError: boom", frames=()):
+    test = {"nodeid": nodeid, "outcome": "failed", "setup": {"outcome": "passed"}}
+    test[stage] = {
+        "outcome": "failed",
+        "crash": {
+            "path": "/root/project/tests/conftest.py",
+            "lineno": 5,
+            "message": message,
+        },
+        "traceback": [{"path": path, "lineno": lineno} for path, lineno in frames],
+    }
+    return test
+
+
+def test_passed_test_has_no_signature():
+    test = {
+        "nodeid": "a.py::test_a",
+        "setup": {"outcome": "passed"},
+        "call": {"outcome": "passed"},
+    }
+    assert failure_signature(test) is None
+
+
+def test_same_failure_same_signature():
+    frames = [
+        ("/venv/lib/python3.11/site-packages/requests/api.py", 10),
+        ("/root/project/tests/conftest.py", 5),
+    ]
+    a = failure_signature(
+        make_report_test("a.py::test_a", "setup", "TimeoutError: 1s", frames),
+        root="/root/project",
+    )
+    b = failure_signature(
+        make_report_test("b.py::test_b", "setup", "TimeoutError: 2s", frames),
+        root="/root/project",
+    )
+
+    assert a == b
+    assert a["exception"] == "TimeoutError"
+    assert a["stage"] == "setup"
+    assert a["location"] == "tests/conftest.py:5"
+
+
+def test_different_failures_different_signatures():
+    frames = [("tests/a.py", 3)]
+    assertion = failure_signature(make_report_test("a.py::test_a", frames=frames))
+    key_error = failure_signature(
+        make_report_test("a.py::test_a", message="KeyError: 'x'", frames=frames)
+    )
+    other_line = failure_signature(
+        make_report_test("a.py::test_a", frames=[("tests/a.py", 4)])
+    )
+
+    assert len({assertion["id"], key_error["id"], other_line["id"]}) == 3
+
+
+def test_cluster_failures():
+    signatures = {
+        "timeout": {
+            "id": "timeout",
+            "stage": "setup",
+            "exception": "TimeoutError",
+            "location": "",
+        },
+        "assert": {
+            "id": "assert",
+            "stage": "call",
+            "exception": "AssertionError",
+            "location": "",
+        },
+    }
+    tests = [
+        make_test("a.py::test_a", 1, 2, signatures={"timeout": 2}),
+        make_test("a.py::test_b", 1, 2, signatures={"timeout": 1, "assert": 1}),
+        make_test("a.py::test_c", 0, 3, signatures={"timeout": 3}),  # not flaky
+    ]
+
+    failure_clusters = FailureClusters(signatures)
+    for test in tests:
+        failure_clusters.add(test)
+    clusters = failure_clusters.sorted()
+
+    assert [cluster.signature["id"] for cluster in clusters] == ["timeout", "assert"]
+    assert [test.test.nodeid for test in clusters[0].tests] == [
+        "a.py::test_a",
+        "a.py::test_b",
+    ]
+    assert clusters[0].failures == 3
+    assert str(clusters[1]) == "assert AssertionError in call (tests: 1, failures: 1)"